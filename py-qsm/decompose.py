@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*-coding:utf-8 -*-
+'''
+@File    :   decompose.py
+@Time    :   2026/10/18 14:05:52
+@Version :   0.0.1
+@Status  :   Prototype
+@License :   MIT License, Copyright (C) 2022-2023, Katalin Fazekas, TU Wien, Austria
+@Desc    :   Decomposition of the reachable states into independent factors
+'''
+
+import itertools
+from typing import Dict, List, Iterator
+
+from prime_implicants import Cube, PIClass
+from preprocess import ReducedSymmetryHandler
+
+from pysat.solvers import Cadical # type: ignore
+
+
+class PLADecomposer():
+    """Finds a factorization R = R_1 & ... & R_k of the reachable states
+    into functions over disjoint groups of atoms. The PIs of the negation
+    of R are then the PIs of the negations of the factors.
+
+    The factors are unions of predicates, so every symmetry maps each
+    factor to itself. Predicates that depend on each other are found by
+    pairwise product checks of the projections (co-occurrence), and each
+    candidate factor is confirmed by a SAT check against the remaining
+    atoms. Candidates that are not confirmed stay in the last factor.
+    """
+    def __init__(self, atoms: List[str], cube_strs: List[str]) -> None:
+        self.atoms = atoms
+        self.cube_strs = cube_strs
+        self.v = 0
+        self.sat_calls = 0
+
+    def project(self, cube_strs: List[str], idxs: List[int]) -> List[str]:
+        # the distinct projections of the cubes to the atoms of idxs
+        projected = {}
+        for cube_str in cube_strs:
+            projected[''.join([cube_str[idx] for idx in idxs])] = True
+        return list(projected.keys())
+
+    def get_predicate_groups(self) -> List[List[int]]:
+        groups: Dict[str,List[int]] = {}
+        for idx,atom in enumerate(self.atoms):
+            groups.setdefault(atom.split('(')[0], []).append(idx)
+        return list(groups.values())
+
+    def is_product(self, cube_strs: List[str], first: List[int], second: List[int]) -> bool:
+        """Checks whether the cubes (over the atoms first+second) describe
+        the product of their projections to first and to second: no state
+        satisfies both projections while falsifying every cube.
+        """
+        atoms = first + second
+        var = {idx: pos+1 for (pos,idx) in enumerate(atoms)}
+        top = len(atoms)
+        clauses = []
+        # no cube is satisfied
+        for cube_str in cube_strs:
+            clauses.append([-1*var[idx] if cube_str[idx] == '1' else var[idx] for idx in atoms if cube_str[idx] != '-'])
+        # both projections are satisfied: a selected projected cube each
+        for idxs in [first,second]:
+            selectors = []
+            for cube_str in self.project(cube_strs, idxs):
+                if cube_str.count('-') == len(cube_str):
+                    selectors = None
+                    break
+                top += 1
+                selectors.append(top)
+                for (idx,lit) in zip(idxs,cube_str):
+                    if lit != '-':
+                        clauses.append([-1*top, var[idx] if lit == '1' else -1*var[idx]])
+            if selectors is not None:
+                clauses.append(selectors)
+        self.sat_calls += 1
+        with Cadical(bootstrap_with=clauses) as sat_solver:
+            return not sat_solver.solve()
+
+    def run(self) -> List[List[int]]:
+        groups = self.get_predicate_groups()
+        if len(self.cube_strs) == 0 or len(groups) < 2:
+            return [list(range(len(self.atoms)))]
+
+        # predicates that are not independent of each other are in the same
+        # candidate factor (connected components)
+        component = list(range(len(groups)))
+        def find(g_idx):
+            while component[g_idx] != g_idx:
+                g_idx = component[g_idx]
+            return g_idx
+        for (g1,g2) in itertools.combinations(range(len(groups)),2):
+            if find(g1) == find(g2):
+                continue
+            pair_cubes = self.project(self.cube_strs, groups[g1]+groups[g2])
+            first = list(range(len(groups[g1])))
+            second = list(range(len(groups[g1]),len(groups[g1])+len(groups[g2])))
+            if not self.is_product(pair_cubes, first, second):
+                component[find(g2)] = find(g1)
+        candidates: Dict[int,List[int]] = {}
+        for g_idx,group in enumerate(groups):
+            candidates.setdefault(find(g_idx), []).extend(group)
+
+        # pairwise independence is not enough, each factor is checked
+        # against the rest
+        factors = []
+        rest = sorted(range(len(self.atoms)))
+        for candidate in sorted([sorted(c) for c in candidates.values()]):
+            if len(candidate) == len(rest):
+                break
+            others = [idx for idx in rest if not idx in candidate]
+            rest_cubes = self.project(self.cube_strs, rest)
+            pos = {idx: p for (p,idx) in enumerate(rest)}
+            if self.is_product(rest_cubes, [pos[idx] for idx in candidate], [pos[idx] for idx in others]):
+                factors.append(candidate)
+                rest = others
+        factors.append(rest)
+
+        if self.v > 0:
+            print("Decomposition:")
+            print('\tNumber of factors: {} (SAT calls: {})'.format(len(factors),self.sat_calls))
+            for factor in factors:
+                print('\t\t{} atoms, {} cubes'.format(len(factor),len(self.project(self.cube_strs,factor))))
+        return factors
+
+
+class FactorProjection():
+    # The atoms of a factor, in the interface of PLAPreprocessor used by
+    # ReducedSymmetryHandler: the other atoms are don't cares.
+    def __init__(self, atoms: List[str], kept: List[int]) -> None:
+        self.orig_atoms = atoms
+        self.kept = kept
+        self.representative = list(range(len(atoms)))
+
+    def expand_cube(self, cube: List[str]) -> List[str]:
+        full = ['-']*len(self.orig_atoms)
+        for (idx,lit) in zip(self.kept,cube):
+            full[idx] = lit
+        return full
+
+    def project_cube(self, cube: List[str]) -> List[str]:
+        return [cube[idx] for idx in self.kept]
+
+
+def iter_decomposed_pi_classes(de, dsh, cube_strs: List[str]) -> Iterator[PIClass]:
+    """PI enumeration of the DualEncoder de per factor of the cubes. Each
+    factor is enumerated by its own encoder (with the settings of de) over
+    its atoms, then the PIs are yielded as PI-classes over all atoms of de.
+    """
+    decomposer = PLADecomposer(de.atoms, cube_strs)
+    decomposer.v = de.verbosity
+    factors = decomposer.run()
+
+    de.decompose = False
+    if len(factors) < 2:
+        yield from de.iter_prime_implicant_classes(dsh, cube_strs)
+        de.decompose = True
+        return
+
+    reps = []
+    for f_idx,factor in enumerate(factors):
+        factor_atoms = [de.atoms[idx] for idx in factor]
+        fe = type(de)(factor_atoms)
+        fe.verbosity = de.verbosity
+        fe.count_label = 'factor {}'.format(f_idx+1)
+        fe.lazy_orbits = True
+        fe.symmetry_breaking = de.symmetry_breaking
+        fe.max_sbp_perms = de.max_sbp_perms
+        fe.pi_engine = de.pi_engine
+        fe.parallel = de.parallel
+        projection = FactorProjection(de.atoms, factor)
+        Cube.setup_universe(len(factor_atoms)+1,factor_atoms)
+        for pic in fe.iter_prime_implicant_classes(ReducedSymmetryHandler(dsh, projection), decomposer.project(cube_strs, factor)):
+            reps.append(projection.expand_cube(pic.repr_pi.all_literals))
+    Cube.setup_universe(len(de.atoms)+1,de.atoms)
+    de.decompose = True
+
+    pi_count = 0
+    for rep in reps:
+        pi_class = de.new_pi_class(dsh, rep)
+        pi_count += pi_class.size
+        yield pi_class
+    de.print_pi_counts(pi_count, len(reps))
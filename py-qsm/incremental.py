@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*-coding:utf-8 -*-
+'''
+@File    :   incremental.py
+@Time    :   2026/10/18 15:21:40
+@Version :   0.0.1
+@Status  :   Prototype
+@License :   MIT License, Copyright (C) 2022-2023, Katalin Fazekas, TU Wien, Austria
+@Desc    :   Update of a stored PI list when the reachable states grow
+'''
+
+from typing import List, Optional, Tuple
+
+from prime_implicants import Cube
+from orbit_store import OrbitStore
+
+from pysat.solvers import Cadical # type: ignore
+
+
+def get_masks(cube_strs: List[str]) -> List[Tuple[int,int]]:
+    masks = []
+    for cube_str in cube_strs:
+        cube = Cube(cube_str, with_id=False)
+        masks.append((cube.care_mask,cube.value_mask))
+    return masks
+
+def is_prime(care: int, value: int, cube_masks: List[Tuple[int,int]]) -> bool:
+    # An implicant of the negated cubes is prime iff each of its literals is
+    # the only conflict with some cube.
+    needed = 0
+    for (cube_care,cube_value) in cube_masks:
+        conflict = care & cube_care & (value ^ cube_value)
+        if conflict & (conflict-1) == 0:
+            needed |= conflict
+    return needed == care
+
+def get_minimal_extensions(care: int, value: int, cube_masks: List[Tuple[int,int]]) -> List[Tuple[int,int]]:
+    # The minimal cubes that extend (care,value) and conflict with every
+    # cube: one cube at a time, an extension without a conflict is extended
+    # by each negated literal of the cube, then the subsumed ones are dropped.
+    extensions = [(care,value)]
+    for (cube_care,cube_value) in cube_masks:
+        # the extensions with a conflict are still minimal, only the new
+        # ones can be subsumed
+        kept = []
+        extended = set()
+        for (ext_care,ext_value) in extensions:
+            if ext_care & cube_care & (ext_value ^ cube_value):
+                kept.append((ext_care,ext_value))
+                continue
+            bits = cube_care & ~ext_care
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                extended.add((ext_care | bit, ext_value | (~cube_value & bit)))
+        extensions = kept
+        for (ext_care,ext_value) in sorted(extended, key=lambda ext: ext[0].bit_count()):
+            if not any(c & ~ext_care == 0 and (ext_value & c) == v for (c,v) in extensions):
+                extensions.append((ext_care,ext_value))
+    return extensions
+
+def is_contained(old_cubes: List[str], cube_strs: List[str]) -> bool:
+    # Every state of the old cubes is a state of the new cubes.
+    with Cadical(bootstrap_with=[Cube(c, with_id=False).care_neg for c in cube_strs]) as sat_solver:
+        for old_cube in old_cubes:
+            if sat_solver.solve(assumptions=Cube(old_cube, with_id=False).care):
+                return False
+    return True
+
+def update_pi_orbits(store: OrbitStore, dsh, cube_strs: List[str], verbosity: int = 0) -> Optional[OrbitStore]:
+    """Updates the PI orbits of a complete store to the new reachable states
+    (cube_strs), which have to contain the states of store.cubes. Returns
+    None when the store can not be updated (then the PIs have to be
+    enumerated from scratch).
+
+    With the new cubes D (closed under the symmetries), every PI of
+    not(R | D) is a minimal extension of a PI p of not(R) that conflicts with
+    every cube of D. Up to symmetry p can be the representative of its orbit:
+    a representative that conflicts with every cube of D is kept, the others
+    are replaced by their minimal extensions that are prime for the new
+    cubes.
+    """
+    atoms = store.atoms
+    if not store.is_complete() or len(store.cubes) == 0:
+        if verbosity > 0: print("The PI store has no reachable states to update from.")
+        return None
+    if not is_contained(store.cubes, cube_strs):
+        if verbosity > 0: print("The new reachable states do not contain the stored ones.")
+        return None
+
+    old_cubes = set(store.cubes)
+    delta = {}
+    for cube_str in cube_strs:
+        if not cube_str in old_cubes:
+            for variant in dsh.get_symmetric_variants(list(cube_str)):
+                delta[''.join(variant)] = True
+    delta_cubes = list(delta.keys())
+
+    delta_masks = get_masks(delta_cubes)
+    cube_masks = get_masks(cube_strs)
+
+    found_keys = set()
+    reps = []
+    kept_count = 0
+    candidate_count = 0
+    for rep_str in store.reps:
+        pi = Cube(rep_str, with_id=False)
+        candidates = [rep_str]
+        extensions = get_minimal_extensions(pi.care_mask, pi.value_mask, delta_masks)
+        if extensions == [(pi.care_mask,pi.value_mask)]:
+            kept_count += 1
+        else:
+            candidates = []
+            for (care,value) in extensions:
+                candidate_count += 1
+                if is_prime(care, value, cube_masks):
+                    candidates.append(Cube.from_masks(care, value, with_id=False).to_str())
+        for candidate in candidates:
+            key = ''.join(dsh.canonicalize(list(candidate)))
+            if not key in found_keys:
+                found_keys.add(key)
+                reps.append(candidate)
+
+    updated = OrbitStore(atoms)
+    updated.ub = len(atoms)+1
+    updated.cubes = list(cube_strs)
+    next_id = len(atoms)+1
+    for rep_str in reps:
+        size = dsh.orbit_size(list(rep_str))
+        updated.reps.append(rep_str)
+        updated.sizes.append(size)
+        updated.ids.append(next_id)
+        next_id += size
+
+    if verbosity > 0:
+        print("Incremental PI update:")
+        print('\tNew cubes: {} (closed under symmetry: {})'.format(len(cube_strs)-len(old_cubes & set(cube_strs)),len(delta_cubes)))
+        print('\tExtended candidates: {}'.format(candidate_count))
+        print('\tPI-classes: {} -> {} (kept: {})'.format(len(store.reps),len(reps),kept_count))
+    return updated
@@ -16,6 +16,10 @@ from os import path
 from input_parser import parse_input_files
 from sat_encodings import *
 from prime_implicants import *
+from symmetry import PermTableCache
+from orbit_store import OrbitStore
+from preprocess import PLAPreprocessor, iter_preprocessed_pi_classes
+from incremental import update_pi_orbits
 from operator import attrgetter,itemgetter
 
 class Minimizer():
@@ -26,6 +30,15 @@ class Minimizer():
         self.check_solution = False
 
         self.prefer_consts = True
+        # explicit minterm bitsets when there are at most this many minterms
+        self.bitset_threshold = 1 << 16
+        # size limit of the SAT query cache of the cover table (0: no cache)
+        self.sat_cache_mb = 0
+
+        # unk and coverages at each decision, restored by backtrack
+        self.undo_log = []
+        self.restored = False
+        self.skipped_checks = 0
 
         self.best_solutions = []
         self.current_cost = 0
@@ -35,7 +48,13 @@ class Minimizer():
         self.pic_list = pic_list
         
     def init_solve(self):
-        self.ct = CoverTable(self.pic_list, len(PIClass._atoms))
+        n = len(PIClass._atoms)
+        if (1 << n) <= self.bitset_threshold:
+            self.ct = BitsetCoverTable(self.pic_list, n)
+        else:
+            self.ct = CoverTable(self.pic_list, n)
+            if self.sat_cache_mb > 0:
+                self.ct.query_cache = SATQueryCache(list(self.ct.all_PIs.keys()),self.sat_cache_mb)
         if self.v > -1:
             print("PI details:")
             for pic in self.pic_list:
@@ -58,6 +77,8 @@ class Minimizer():
 
         self.UB = self.max_cost + 1
 
+        if isinstance(self.ct, BitsetCoverTable):
+            print("Cover table: minterm bitsets ({} minterms)".format(1 << len(PIClass._atoms)))
         print("Root essential: {}".format(self.ptrail))
 
         if not self.unk:
@@ -88,7 +109,14 @@ class Minimizer():
 
         while (True):
             while (True):
-                covered = self.ct.remove_covered_pis(self.ptrail, self.unk, self.trail)
+                if self.restored:
+                    # ptrail is the same as when the decision was made, so
+                    # none of unk is covered
+                    covered = []
+                    self.skipped_checks += len(self.unk)
+                    self.restored = False
+                else:
+                    covered = self.ct.remove_covered_pis(self.ptrail, self.unk, self.trail)
                 if self.v > 2:
                     for pid in covered:
                         print("P-{}".format(pid),end=' ')
@@ -118,6 +146,10 @@ class Minimizer():
                     if not pid:
                         break            
         print()
+        print("SAT calls: {} (covered checks skipped after backtracking: {}, essential checks certified by cores: {})".format(self.ct.sat_calls,self.skipped_checks,self.ct.core_skips))
+        if self.ct.query_cache is not None:
+            qc = self.ct.query_cache
+            print("SAT query cache: {} hits ({} by monotonicity), {} misses, {} evictions".format(qc.hits+qc.monotone_hits,qc.monotone_hits,qc.misses,qc.evictions))
         print("Looking for ALL solutions: {}".format(self.all_solutions))
         print("All PIs:    ",list(self.all_PIs.keys()))
         print("A solution: {} (from {} found solutions)".format(self.best_solutions[0],len(self.best_solutions)))
@@ -155,6 +187,11 @@ class Minimizer():
             if pic.decided:
                 if self.v > 2: print("undo&flip decision {} (trail length: {}/{})".format(v,len(self.trail)+1,len(self.all_PIs)))
                 pic.decided = False
+                (unk, coverages) = self.undo_log.pop()
+                self.unk[:] = [other_pid for other_pid in unk if other_pid != pid]
+                for other_pid,coverage in coverages.items():
+                    self.all_PIs[other_pid].coverage = coverage
+                self.restored = True
                 self.assign(-1*v)
            
                 return pid
@@ -175,6 +212,7 @@ class Minimizer():
                     idx = u_idx
                     break
         
+        self.undo_log.append((self.unk[:], {pid: self.all_PIs[pid].coverage for pid in self.unk}))
         pid = self.unk.pop(idx)
         self.all_PIs[pid].decided = True
         self.assign(pid)
@@ -216,6 +254,24 @@ def usage ():
     print("--print-dimacs=path-to-dimancs-file.dimacs\t\tDump the underlying SAT formula of the minimization to file.")
     print("--print-classinfo=path-to-qcost-orbit-relation-file\tDump the short summary of qcosts and quantified forms to file.")
     print("--prefer-consts\t\t\t\t\t\tPrioritize orbits with constants in them during decision (default: False).")
+    print("--bitset-threshold=N\t\t\t\t\tUse explicit minterm bitsets for the cover table up to N minterms, 0 disables (default: 65536).")
+    print("--sat-cache-mb=MB\t\t\t\t\tCache the SAT results of the cover table up to MB megabytes (default: 0, no cache).")
+    print("--perm-cache=path-to-cache-directory\t\t\tReuse the permutation tables stored in the directory (default: None).")
+    print("--perm-cache-size=MB\t\t\t\t\tSize limit of the permutation table cache (default: 1024).")
+    print("--check-symmetry\t\t\t\t\tCheck that the input cubes are closed under the symmetries (default: False).")
+    print("--lazy-orbits\t\t\t\t\t\tStore only the representative of each orbit, members are generated on demand (default: False).")
+    print("--preprocess\t\t\t\t\t\tDrop constant and equivalent atoms, subsumed cubes and merge cubes before the PI enumeration (default: False).")
+    print("--decompose\t\t\t\t\t\tEnumerate the PIs per independent factor of the reachable states (default: False).")
+    print("--pi-engine=<totalizer|minimal>\t\t\t\tPI enumeration by cardinality sweep or by shrinking models to PIs (default: totalizer).")
+    print("--parallel=N\t\t\t\t\t\tEnumerate the PIs with N worker processes, cube-and-conquer (default: 1).")
+    print("--save-pis=<file>\t\t\t\t\tSave the PI-classes to a binary orbit store (default: not saved).")
+    print("--load-pis=<file>\t\t\t\t\tLoad the PI-classes from a store of --save-pis instead of enumerating them (default: not loaded).")
+    print("--update-pis\t\t\t\t\t\tUpdate the PIs of --load-pis to the (grown) reachable states and store them back (default: False).")
+    print("--checkpoint=<file>\t\t\t\t\tSave the state of the PI enumeration periodically to <file> (default: no checkpoints).")
+    print("--checkpoint-interval=SEC\t\t\t\tTime between two checkpoints in seconds (default: 60).")
+    print("--resume\t\t\t\t\t\tContinue the PI enumeration from the checkpoint file if it exists (default: False).")
+    print("--symmetry-breaking\t\t\t\t\tEnumerate mostly canonical orbit representatives via lex-leader constraints, fewer blocking clauses (default: False).")
+    print("--symmetry-generators\t\t\t\t\tKeep only a generating set of the symmetry group, orbits are computed by closure (default: False).")
 def usage_and_exit ():
     usage()
     sys.exit(1)
@@ -224,6 +280,7 @@ def usage_and_exit ():
 def get_R_as_PI_classes(R_cubes,dsh,atoms):
     n = len(atoms)
     pi_classes = []
+    cubes = []
     for cube_str in R_cubes:
         cube = ['-']*n
         for idx,atom in enumerate(atoms):
@@ -232,15 +289,12 @@ def get_R_as_PI_classes(R_cubes,dsh,atoms):
 
             elif cube_str[idx] == '0':
                 cube[idx] = '0'
+        cubes.append(cube)
 
-        found = False
-        for pic in pi_classes:
-            if pic.has_cube(cube):
-                found = True
-                break
-        if found:
-            continue
-        cube_class = dsh.get_symmetric_variants(cube)
+    # orbits are identified by the canonical form of their members
+    registry = PIClassRegistry(dsh)
+    for key,cube_idxs in registry.classify(cubes).items():
+        cube_class = dsh.get_symmetric_variants(cubes[cube_idxs[0]])
         
         pi_class = None
         for c in cube_class:
@@ -253,7 +307,48 @@ def get_R_as_PI_classes(R_cubes,dsh,atoms):
 
         print('{}'.format(pi_class))
         
+        pi_class.canonical_form = key
+        registry.classes[key] = pi_class
+        pi_classes.append(pi_class)
+    return pi_classes
+
+def save_pi_classes(all_pis,atoms,cube_strs,store_path):
+    # The PI-classes as a complete orbit store (see --load-pis).
+    store = OrbitStore(atoms)
+    store.ub = len(atoms)+1
+    store.cubes = list(cube_strs)
+    for pic in all_pis:
+        store.reps.append(pic.repr_pi.to_str())
+        store.sizes.append(pic.size)
+        store.ids.append(pic.id)
+    store.save(store_path)
+
+def load_pi_classes(store_path,dsh,atoms,cube_strs,lazy_orbits):
+    # The PI-classes of a store written by --save-pis, with their original ids
+    # (None when the store was computed from other reachable states).
+    store = OrbitStore.load(store_path,atoms)
+    if not store.is_complete():
+        print("Error: {} is not a complete PI list.".format(store_path))
+        sys.exit(1)
+    if not store.has_cubes(cube_strs):
+        return None
+    pi_classes = []
+    next_id = len(atoms)+1
+    for (rep_str,size,pic_id) in zip(store.reps,store.sizes,store.ids):
+        repr_cube = Cube(rep_str, with_id=False)
+        repr_cube.id = pic_id
+        pi_class = PIClass(repr_cube)
+        if lazy_orbits:
+            pi_class.set_lazy_orbit(dsh, size)
+        else:
+            variants = dsh.get_symmetric_variants(list(rep_str))
+            for idx,variant in enumerate(variants[1:]):
+                cube = Cube(variant, with_id=False)
+                cube.id = pic_id + idx + 1
+                pi_class.add_equivalent_cube(cube)
         pi_classes.append(pi_class)
+        next_id = max(next_id, pic_id + size)
+    Cube.skip_ids_to(next_id)
     return pi_classes
 
 def calculate_weights(all_pis,wfile):
@@ -280,7 +375,7 @@ def calculate_weights(all_pis,wfile):
                 pi_details[cube_str] = (qform,qcost)
 
     for pic in all_pis:
-        cube_str = ''.join(pic.repr_pi.all_literals)
+        cube_str = pic.repr_pi.to_str()
         if cube_str in pi_details:
             print(pi_details[cube_str])
             pic.quantified_form, pic.qcost = pi_details[cube_str]
@@ -303,12 +398,32 @@ def main ():
     print_dimacs = False
     print_picinfo = False
     weight_path = None 
+    perm_cache_path = None
+    perm_cache_size = 1024
+    checkpoint_path = None
+    checkpoint_interval = 60
+    save_pis_path = None
+    load_pis_path = None
+    nof_workers = 1
+    pi_engine = "totalizer"
+    bitset_threshold = 1 << 16
+    sat_cache_mb = 0
    
     for opt in sys.argv[3:]:
-        if not opt in ["--all-solutions","--verbose","--check-solution","--only-pis", "--prefer-consts"] and\
+        if not opt in ["--all-solutions","--verbose","--check-solution","--only-pis", "--prefer-consts", "--symmetry-generators", "--check-symmetry", "--lazy-orbits", "--symmetry-breaking", "--resume", "--preprocess", "--decompose", "--update-pis"] and\
             not opt.startswith("--pi-weights=") and\
             not opt.startswith("--print-dimacs=") and\
-            not opt.startswith("--print-classinfo="):
+            not opt.startswith("--print-classinfo=") and\
+            not opt.startswith("--perm-cache=") and\
+            not opt.startswith("--perm-cache-size=") and\
+            not opt.startswith("--pi-engine=") and\
+            not opt.startswith("--parallel=") and\
+            not opt.startswith("--save-pis=") and\
+            not opt.startswith("--load-pis=") and\
+            not opt.startswith("--checkpoint=") and\
+            not opt.startswith("--checkpoint-interval=") and\
+            not opt.startswith("--bitset-threshold=") and\
+            not opt.startswith("--sat-cache-mb="):
             print("Unrecognized option: ",opt)
             usage_and_exit ()
         if opt.startswith("--pi-weights="):
@@ -320,6 +435,29 @@ def main ():
         elif opt.startswith("--print-classinfo="):
             print_picinfo = True
             picinfo_path = opt[18:]
+        elif opt.startswith("--perm-cache="):
+            perm_cache_path = opt[13:]
+        elif opt.startswith("--perm-cache-size="):
+            perm_cache_size = int(opt[18:])
+        elif opt.startswith("--pi-engine="):
+            pi_engine = opt[12:]
+            if not pi_engine in ["totalizer","minimal"]:
+                print("Unknown PI engine: ",pi_engine)
+                usage_and_exit ()
+        elif opt.startswith("--parallel="):
+            nof_workers = int(opt[11:])
+        elif opt.startswith("--save-pis="):
+            save_pis_path = opt[11:]
+        elif opt.startswith("--load-pis="):
+            load_pis_path = opt[11:]
+        elif opt.startswith("--checkpoint="):
+            checkpoint_path = opt[13:]
+        elif opt.startswith("--checkpoint-interval="):
+            checkpoint_interval = int(opt[22:])
+        elif opt.startswith("--bitset-threshold="):
+            bitset_threshold = int(opt[19:])
+        elif opt.startswith("--sat-cache-mb="):
+            sat_cache_mb = int(opt[15:])
         elif opt == "--only-pis":
             silent = True
             
@@ -329,15 +467,85 @@ def main ():
     Cube.setup_universe(len(atoms)+1,atoms)
     PIClass.setup_universe(pp.atoms)
 
-    dsh = DomainSymmetryHandler(domains,pp.predicates,pp.atoms)
+    generators_only = ("--symmetry-generators" in sys.argv[3:])
+    perm_cache = None
+    if perm_cache_path is not None:
+        perm_cache = PermTableCache(perm_cache_path, perm_cache_size)
+    dsh = DomainSymmetryHandler(domains,pp.predicates,pp.atoms,generators_only=generators_only,perm_cache=perm_cache)
+    if ("--check-symmetry" in sys.argv[3:]):
+        dsh.is_cube_set_symmetric(cube_strs)
 
     # R_pi_classes = get_R_as_PI_classes(cube_strs,dsh,atoms)
     # mm = Minimizer(R_pi_classes)
     
-    de = DualEncoder(atoms)
-    if silent:
-        de.verbosity = 0
-    all_pis = de.extract_prime_implicants(dsh, cube_strs)
+    if load_pis_path is not None and ("--update-pis" in sys.argv[3:]):
+        # the stored PIs are updated to the (grown) reachable states
+        updated = update_pi_orbits(OrbitStore.load(load_pis_path,atoms),dsh,cube_strs,0 if silent else 1)
+        if save_pis_path is None:
+            save_pis_path = load_pis_path
+        if updated is not None:
+            updated.save(save_pis_path)
+            load_pis_path = save_pis_path
+            save_pis_path = None
+        else:
+            load_pis_path = None
+
+    pi_classes = None
+    if load_pis_path is not None:
+        # the PIs of an earlier --save-pis run, no enumeration
+        pi_classes = load_pi_classes(load_pis_path,dsh,atoms,cube_strs,("--lazy-orbits" in sys.argv[3:]))
+        if pi_classes is not None and not silent:
+            # the counts of the enumeration (see scripts/runlim_stats.py)
+            print("PI-classes loaded from {}:".format(load_pis_path))
+            print('\tNumber of PIs: {}'.format(sum([pic.size for pic in pi_classes])))
+            print('\tNumber of PI-classes: {}'.format(len(pi_classes)))
+        if pi_classes is None:
+            # a stale store is replaced by the enumerated PIs
+            if save_pis_path is None:
+                save_pis_path = load_pis_path
+            print("The PIs of {} do not match the input cubes, they are enumerated again (saved to {}).".format(load_pis_path,save_pis_path), file=sys.stderr)
+    if pi_classes is None:
+        pre = None
+        if ("--preprocess" in sys.argv[3:]):
+            pre = PLAPreprocessor(atoms, cube_strs)
+            pre.v = 0 if silent else 1
+            pre.run()
+        de = DualEncoder(atoms if pre is None else pre.atoms)
+        if silent:
+            de.verbosity = 0
+        de.lazy_orbits = ("--lazy-orbits" in sys.argv[3:])
+        de.symmetry_breaking = ("--symmetry-breaking" in sys.argv[3:])
+        de.checkpoint_path = checkpoint_path
+        de.checkpoint_interval = checkpoint_interval
+        de.resume = ("--resume" in sys.argv[3:])
+        if de.resume and checkpoint_path is None:
+            print("Error: --resume requires --checkpoint=<file>.")
+            usage_and_exit()
+        de.pi_engine = pi_engine
+        de.decompose = ("--decompose" in sys.argv[3:])
+        de.parallel = nof_workers
+        if de.parallel > 1 and (de.symmetry_breaking or checkpoint_path is not None):
+            print("Error: --parallel can not be combined with --symmetry-breaking or --checkpoint.")
+            usage_and_exit()
+        if pre is None:
+            pi_classes = de.iter_prime_implicant_classes(dsh, cube_strs)
+        else:
+            pi_classes = iter_preprocessed_pi_classes(de, dsh, pre)
+
+    # With --only-pis each PI is printed as soon as its orbit is found, so
+    # partial results survive a timeout.
+    only_pis = ("--only-pis" in sys.argv[3:])
+    if only_pis:
+        print("// PIC list of {}".format(pla_file.split('/')[-1]))
+        print("// PLA Header: {}".format(' '.join(atoms)), flush=True)
+    all_pis = []
+    for pic in pi_classes:
+        all_pis.append(pic)
+        if only_pis:
+            print(pic.repr_pi.to_str(), flush=True)
+
+    if save_pis_path is not None:
+        save_pi_classes(all_pis,atoms,cube_strs,save_pis_path)
 
     if import_costs:
         calculate_weights(all_pis,weight_path)
@@ -364,12 +572,7 @@ def main ():
                         ' '.join([str(lit) for lit in pic.repr_pi.care]),\
                         "none")) 
                     
-    if ("--only-pis" in sys.argv[3:]):
-        print("// PIC list of {}".format(pla_file.split('/')[-1]))
-        print("// PLA Header: {}".format(' '.join(atoms)))
-        for pic in all_pis:    
-            print(''.join(pic.repr_pi.all_literals))
-        
+    if only_pis:
         return
 
     mm = Minimizer(all_pis)
@@ -377,6 +580,8 @@ def main ():
     if ("--all-solutions" in sys.argv[3:]): mm.all_solutions = True
     if ("--verbose" in sys.argv[3:]): mm.v = 3
     if ("--check-solution" in sys.argv[3:]): mm.check_solution = True
+    mm.bitset_threshold = bitset_threshold
+    mm.sat_cache_mb = sat_cache_mb
     
     if not silent:
         print("Protocol specification: {}".format(ivy_file))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*-coding:utf-8 -*-
+'''
+@File    :   orbit_store.py
+@Time    :   2026/10/18 09:12:05
+@Version :   0.0.1
+@Status  :   Prototype
+@License :   MIT License, Copyright (C) 2022-2023, Katalin Fazekas, TU Wien, Austria
+@Desc    :   Binary store of the enumerated PI orbits
+'''
+
+import os
+import sys
+import numpy as np
+from typing import List, Tuple
+
+
+def pack_cubes(cube_strs: List[str], n: int) -> Tuple[np.ndarray,np.ndarray]:
+    # Two bits per atom: the care bits and the value bits of the cubes.
+    codes = np.frombuffer(''.join(cube_strs).encode(), dtype=np.uint8).reshape(len(cube_strs),n)
+    care = np.packbits(codes != ord('-'), axis=1)
+    value = np.packbits(codes == ord('1'), axis=1)
+    return care, value
+
+def unpack_cubes(care: np.ndarray, value: np.ndarray, n: int) -> List[str]:
+    if len(care) == 0:
+        return []
+    care_bits = np.unpackbits(care, axis=1, count=n).astype(bool)
+    value_bits = np.unpackbits(value, axis=1, count=n).astype(bool)
+    codes = np.full(care_bits.shape, ord('-'), dtype=np.uint8)
+    codes[care_bits & ~value_bits] = ord('0')
+    codes[care_bits & value_bits] = ord('1')
+    return [row.tobytes().decode() for row in codes]
+
+
+class OrbitStore():
+    """The state of a PI enumeration: the current cardinality bound (ub),
+    the representatives of the found orbits with their sizes and ids, and
+    the cubes that are blocked in the solver (when they are not simply the
+    orbits of the representatives). The cubes are bit-packed in an .npz
+    file, written atomically, so a killed run leaves the previous state
+    behind. A complete store (ub is above the number of atoms) is the
+    PI list of the instance, together with the reachable states (cubes)
+    it was computed from.
+    """
+    def __init__(self, atoms: List[str]) -> None:
+        self.atoms = atoms
+        self.ub = 0
+        self.reps = []
+        self.sizes = []
+        self.ids = []
+        self.blocked = []
+        self.cubes = []
+        self.symmetry_breaking = False
+
+    def save(self, path: str) -> None:
+        n = len(self.atoms)
+        reps_care, reps_value = pack_cubes(self.reps, n)
+        blocked_care, blocked_value = pack_cubes(self.blocked, n)
+        cubes_care, cubes_value = pack_cubes(self.cubes, n)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as store_file:
+            np.savez(store_file, atoms=np.array(self.atoms), ub=self.ub,\
+                symmetry_breaking=self.symmetry_breaking,\
+                reps_care=reps_care, reps_value=reps_value,\
+                sizes=np.array(self.sizes, dtype=np.int64),\
+                ids=np.array(self.ids, dtype=np.int64),\
+                blocked_care=blocked_care, blocked_value=blocked_value,\
+                cubes_care=cubes_care, cubes_value=cubes_value)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, atoms: List[str]) -> 'OrbitStore':
+        with np.load(path) as data:
+            if data['atoms'].tolist() != atoms:
+                print("Error: the atoms of {} do not match the atoms of the input.".format(path))
+                sys.exit(1)
+            n = len(atoms)
+            store = cls(atoms)
+            store.ub = int(data['ub'])
+            store.symmetry_breaking = bool(data['symmetry_breaking'])
+            store.reps = unpack_cubes(data['reps_care'], data['reps_value'], n)
+            store.sizes = data['sizes'].tolist()
+            store.ids = data['ids'].tolist()
+            store.blocked = unpack_cubes(data['blocked_care'], data['blocked_value'], n)
+            if 'cubes_care' in data:
+                store.cubes = unpack_cubes(data['cubes_care'], data['cubes_value'], n)
+        return store
+
+    def is_complete(self) -> bool:
+        return self.ub > len(self.atoms)
+
+    def has_cubes(self, cube_strs: List[str]) -> bool:
+        # the store was computed from the reachable states cube_strs (stores
+        # without cubes can not be checked)
+        return len(self.cubes) > 0 and set(self.cubes) == set(cube_strs)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*-coding:utf-8 -*-
+'''
+@File    :   preprocess.py
+@Time    :   2026/10/18 12:40:17
+@Version :   0.0.1
+@Status  :   Prototype
+@License :   MIT License, Copyright (C) 2022-2023, Katalin Fazekas, TU Wien, Austria
+@Desc    :   Reduction of the PLA before the dual-rail encoding
+'''
+
+import itertools
+import numpy as np
+from typing import Dict, List, Iterator
+
+from prime_implicants import Cube, PIClass, PIClassRegistry
+
+
+class PLAPreprocessor():
+    """Reduces the set of reachable states (the cubes of the PLA) before the
+    PI enumeration, without changing the PIs of its negation:
+
+    - An atom with the same value in every cube is constant: its negated
+      literal is a PI on its own, and no other PI cares about the atom.
+    - Atoms with the same (don't care free) column are equivalent: the
+      first one represents the whole class. Every pair of different values
+      of two equivalent atoms is a PI, and a literal of the representative
+      in a PI of the reduced cubes can be moved to any atom of its class.
+    - Subsumed cubes are removed and cubes at distance one are merged.
+
+    The remaining atoms keep their original order, PIs of the reduced cubes
+    are re-expanded over the original atoms by expand_pi.
+    """
+    def __init__(self, atoms: List[str], cube_strs: List[str]) -> None:
+        self.orig_atoms = atoms
+        self.orig_cubes = cube_strs
+        self.v = 0
+
+        # constant atom idx -> value
+        self.constants: Dict[int,str] = {}
+        # atom idx -> idx of the representative of its class
+        self.representative = list(range(len(atoms)))
+        # classes of equivalent atoms with more than one element
+        self.atom_classes: List[List[int]] = []
+        # original idx of each kept atom
+        self.kept: List[int] = []
+
+        self.atoms: List[str] = []
+        self.cubes: List[str] = []
+
+    def run(self) -> None:
+        n = len(self.orig_atoms)
+        if len(self.orig_cubes) == 0:
+            self.kept = list(range(n))
+            self.atoms = self.orig_atoms[:]
+            return
+        cube_array = np.frombuffer(''.join(self.orig_cubes).encode(), dtype=np.uint8).reshape(len(self.orig_cubes),n)
+
+        columns: Dict[bytes,List[int]] = {}
+        for idx in range(n):
+            column = cube_array[:,idx]
+            if (column == column[0]).all() and column[0] != ord('-'):
+                self.constants[idx] = chr(column[0])
+            elif not (column == ord('-')).any():
+                columns.setdefault(column.tobytes(), []).append(idx)
+        for atom_class in columns.values():
+            if len(atom_class) > 1:
+                self.atom_classes.append(atom_class)
+                for idx in atom_class:
+                    self.representative[idx] = atom_class[0]
+
+        self.kept = [idx for idx in range(n) if not idx in self.constants and self.representative[idx] == idx]
+        self.atoms = [self.orig_atoms[idx] for idx in self.kept]
+        reduced = [row.tobytes().decode() for row in cube_array[:,self.kept]]
+        self.cubes = self.merge_cubes(reduced)
+
+        if self.v > 0:
+            print("Preprocessing:")
+            print('\tConstant atoms: {}'.format(len(self.constants)))
+            print('\tEquivalent atoms: {} (in {} classes)'.format(sum([len(c)-1 for c in self.atom_classes]),len(self.atom_classes)))
+            print('\tNumber of atoms: {} -> {}'.format(n,len(self.atoms)))
+            print('\tNumber of cubes: {} -> {}'.format(len(self.orig_cubes),len(self.cubes)))
+
+    def merge_cubes(self, cube_strs: List[str]) -> List[str]:
+        # Distance-1 merging and subsumption until fixpoint, on the
+        # (care_mask,value_mask) representation of Cube.
+        cubes = set()
+        for cube_str in cube_strs:
+            cube = Cube(cube_str, with_id=False)
+            cubes.add((cube.care_mask,cube.value_mask))
+        merged_any = True
+        while merged_any:
+            merged_any = False
+            buckets: Dict[int,set] = {}
+            for (care,value) in cubes:
+                buckets.setdefault(care,set()).add(value)
+            merged = set()
+            used = set()
+            for care,values in buckets.items():
+                for value in values:
+                    bits = care
+                    while bits:
+                        bit = bits & -bits
+                        bits ^= bit
+                        if value & bit and (value ^ bit) in values:
+                            merged.add((care ^ bit, value ^ bit))
+                            used.add((care,value))
+                            used.add((care,value ^ bit))
+            if merged:
+                merged_any = True
+                cubes = (cubes - used) | merged
+            cubes = self.remove_subsumed(cubes)
+        width = len(self.atoms)
+        result = []
+        for (care,value) in sorted(cubes):
+            care_str = format(care, '0{}b'.format(width))[::-1] if width else ''
+            value_str = format(value, '0{}b'.format(width))[::-1] if width else ''
+            result.append(''.join([v if c == '1' else '-' for (c,v) in zip(care_str,value_str)]))
+        return result
+
+    def remove_subsumed(self, cubes: set) -> set:
+        # A cube is subsumed when a cube with a subset of its care atoms
+        # agrees with it on them: one lookup per distinct care mask.
+        masks = sorted(set([care for (care,_) in cubes]), key=lambda care: care.bit_count())
+        kept = set()
+        for (care,value) in cubes:
+            subsumed = False
+            for mask in masks:
+                if mask.bit_count() >= care.bit_count():
+                    break
+                if mask & ~care == 0 and (mask, value & mask) in cubes:
+                    subsumed = True
+                    break
+            if not subsumed:
+                kept.add((care,value))
+        return kept
+
+    def expand_cube(self, cube: List[str]) -> List[str]:
+        # A reduced cube over the original atoms, equivalent atoms get the
+        # value of their representative (used for the symmetries).
+        full = ['-']*len(self.orig_atoms)
+        for (idx,lit) in zip(self.kept,cube):
+            full[idx] = lit
+        for atom_class in self.atom_classes:
+            for idx in atom_class[1:]:
+                full[idx] = full[atom_class[0]]
+        return full
+
+    def project_cube(self, cube: List[str]) -> List[str]:
+        return [cube[idx] for idx in self.kept]
+
+    def expand_pi(self, pi_str: str) -> Iterator[str]:
+        # The PIs over the original atoms that come from a PI of the reduced
+        # cubes: each literal of a class representative is moved to each
+        # atom of the class.
+        full = ['-']*len(self.orig_atoms)
+        for (idx,lit) in zip(self.kept,pi_str):
+            full[idx] = lit
+        moved = [atom_class for atom_class in self.atom_classes if full[atom_class[0]] != '-']
+        for targets in itertools.product(*moved):
+            pi = full[:]
+            for atom_class in moved:
+                pi[atom_class[0]] = '-'
+            for (atom_class,target) in zip(moved,targets):
+                pi[target] = full[atom_class[0]]
+            yield ''.join(pi)
+
+    def get_eliminated_pis(self) -> Iterator[str]:
+        # The single-literal PIs of the constants and the two-literal PIs of
+        # the pairs of equivalent atoms.
+        n = len(self.orig_atoms)
+        for idx,value in sorted(self.constants.items()):
+            pi = ['-']*n
+            pi[idx] = '0' if value == '1' else '1'
+            yield ''.join(pi)
+        for atom_class in self.atom_classes:
+            for (first,second) in itertools.permutations(atom_class,2):
+                pi = ['-']*n
+                pi[first] = '1'
+                pi[second] = '0'
+                yield ''.join(pi)
+
+
+class ReducedSymmetryHandler():
+    """The symmetries of the original atoms acting on the cubes of the
+    reduced atoms. The constant atoms and the classes of equivalent atoms
+    are mapped to each other by the symmetries, so a reduced cube is
+    expanded, permuted by the original handler and projected back. (Also
+    used for the factors of decompose.py, with the same interface as pre.)
+    """
+    def __init__(self, dsh, pre: PLAPreprocessor) -> None:
+        self.dsh = dsh
+        self.pre = pre
+        self.symmetric = dsh.symmetric
+        self.generators_only = dsh.generators_only
+
+        # reduced idx of each original atom (through its representative)
+        reduced_idx = np.full(len(pre.orig_atoms), -1, dtype=np.int32)
+        for r_idx,idx in enumerate(pre.kept):
+            reduced_idx[idx] = r_idx
+        for idx,rep in enumerate(pre.representative):
+            if reduced_idx[idx] == -1 and reduced_idx[rep] != -1:
+                reduced_idx[idx] = reduced_idx[rep]
+        kept = np.array(pre.kept, dtype=np.int64)
+        if len(dsh.perm_table) > 0:
+            # the identity stays the first (lexicographically smallest) row
+            self.perm_table = np.unique(reduced_idx[np.asarray(dsh.perm_table)[:,kept]], axis=0)
+        else:
+            self.perm_table = np.empty((0,len(kept)), dtype=np.int32)
+        self.generators = [reduced_idx[np.asarray(gen)[kept]].tolist() for gen in dsh.generators]
+
+    def expand_array(self, cube_arr: np.ndarray) -> np.ndarray:
+        return np.frombuffer(''.join(self.pre.expand_cube(list(cube_arr.tobytes().decode()))).encode(), dtype=np.uint8)
+
+    def get_symmetric_variants_array(self, cube_arr: np.ndarray) -> np.ndarray:
+        variants = self.dsh.get_symmetric_variants_array(self.expand_array(cube_arr))
+        return np.ascontiguousarray(variants[:,self.pre.kept])
+
+    def get_symmetric_variants(self, cube: list):
+        cube_arr = np.frombuffer(''.join(cube).encode(), dtype=np.uint8)
+        return [list(row.tobytes().decode()) for row in self.get_symmetric_variants_array(cube_arr)]
+
+    def orbit_size(self, cube: list) -> int:
+        return self.dsh.orbit_size(self.pre.expand_cube(cube))
+
+    def canonicalize(self, cube: list) -> list:
+        return self.pre.project_cube(self.dsh.canonicalize(self.pre.expand_cube(cube)))
+
+
+def iter_preprocessed_pi_classes(de, dsh, pre: PLAPreprocessor) -> Iterator[PIClass]:
+    """Enumerates the PIs of the reduced cubes with the DualEncoder de (set
+    up for pre.atoms), then yields the PI-classes over the original atoms.
+    The reduced PIs are collected first, as the cubes of both runs share the
+    universe of Cube.
+    """
+    reduced_reps = []
+    if len(pre.atoms) > 0:
+        Cube.setup_universe(len(pre.atoms)+1,pre.atoms)
+        lazy_orbits = de.lazy_orbits
+        count_label = de.count_label
+        de.lazy_orbits = True
+        de.count_label = 'reduced'
+        rdsh = ReducedSymmetryHandler(dsh, pre)
+        reduced_reps = [pic.repr_pi.to_str() for pic in de.iter_prime_implicant_classes(rdsh, pre.cubes)]
+        de.lazy_orbits = lazy_orbits
+        de.count_label = count_label
+    elif len(pre.cubes) == 0:
+        # no reachable states, the empty cube is the only PI
+        reduced_reps = ['']
+    Cube.setup_universe(len(pre.orig_atoms)+1,pre.orig_atoms)
+
+    registry = PIClassRegistry(dsh)
+    pi_count = 0
+    expanded = itertools.chain(pre.get_eliminated_pis(), *[pre.expand_pi(rep) for rep in reduced_reps])
+    for pi_str in expanded:
+        key = registry.get_key(list(pi_str))
+        if key in registry.classes:
+            continue
+        pi_class = de.new_pi_class(dsh, list(pi_str))
+        pi_class.canonical_form = key
+        registry.classes[key] = pi_class
+        pi_count += pi_class.size
+        yield pi_class
+    # the counts over the original atoms
+    de.print_pi_counts(pi_count, len(registry.classes))
@@ -11,52 +11,112 @@
 @Desc    :   None
 '''
 
-from typing import List, Tuple
+from typing import Dict, List, Tuple, Iterator, Optional, Set
 from itertools import count
 
 
 class Cube():
+    """A cube over the atoms, stored as two bit masks: bit idx of care_mask
+    is set when atom idx is not a don't care, bit idx of value_mask is set
+    when atom idx is positive. The list views (all_literals, care, care_neg)
+    are derived on demand.
+    """
+    __slots__ = ('id', 'care_mask', 'value_mask', 'len', '_care')
+
     _ids = count(-1)
     _atoms = None
+    _width = 0
+    _care_table = str.maketrans('-01', '011')
+    _value_table = str.maketrans('-01', '001')
 
     @classmethod
     def setup_universe(cls, first_cube_id: int, atoms: List[str]):
         Cube._ids = count(first_cube_id)  
         Cube._atoms = atoms[:]
+        Cube._width = len(atoms)
+
+    @classmethod
+    def from_masks(cls, care_mask: int, value_mask: int, with_id: bool = True) -> 'Cube':
+        cube = cls.__new__(cls)
+        cube.id = next(Cube._ids) if with_id else 0
+        cube.care_mask = care_mask
+        cube.value_mask = value_mask & care_mask
+        cube.len = care_mask.bit_count()
+        cube._care = None
+        return cube
 
     def __init__(self, lit_strs: List[str], with_id: bool =True) -> None:
         self.id = next(Cube._ids) if with_id else 0
-        self.all_literals = lit_strs[:] #len(atoms)-long cube potentially with '-' values
-        self.care = []
-        self.care_neg = []
-
-        for idx,lit in enumerate(lit_strs):
-            v = idx+1
-            if lit == '1':
-                self.care.append(v)
-                self.care_neg.append(-1*v)
-        
-            elif lit == '0':
-                self.care.append(-1*v)
-                self.care_neg.append(v)
+        #len(atoms)-long cube potentially with '-' values, bit idx is atom idx
+        reversed_lits = ''.join(lit_strs)[::-1]
+        self.care_mask = int(reversed_lits.translate(Cube._care_table) or '0', 2)
+        self.value_mask = int(reversed_lits.translate(Cube._value_table) or '0', 2)
+        self.len = self.care_mask.bit_count()
+        self._care = None
+
+    @classmethod
+    def reserve_ids(cls, count: int) -> None:
+        # skips ids that are given to cubes created later on demand
+        for _ in range(count):
+            next(Cube._ids)
+
+    @classmethod
+    def skip_ids_to(cls, next_id: int) -> None:
+        # the next created cube gets next_id (ids of loaded cubes are not reused)
+        Cube._ids = count(next_id)
+
+    def to_str(self) -> str:
+        width = Cube._width
+        care = format(self.care_mask, '0{}b'.format(width))[::-1]
+        value = format(self.value_mask, '0{}b'.format(width))[::-1]
+        return ''.join([v if c == '1' else '-' for (c,v) in zip(care,value)])
+
+    @property
+    def all_literals(self) -> List[str]:
+        return list(self.to_str())
+
+    @property
+    def care(self) -> List[int]:
+        # literals (variable of atom idx is idx+1) of the care atoms, cached
+        # as they are used as assumptions over and over again
+        if self._care is None:
+            care = []
+            care_mask = self.care_mask
+            while care_mask:
+                low_bit = care_mask & -care_mask
+                v = low_bit.bit_length()
+                care.append(v if self.value_mask & low_bit else -1*v)
+                care_mask ^= low_bit
+            self._care = care
+        return self._care
+
+    @property
+    def care_neg(self) -> List[int]:
+        return [-1*lit for lit in self.care]
+
+    def contains(self, other: 'Cube') -> bool:
+        # every minterm of other is a minterm of self
+        return (self.care_mask & ~other.care_mask) == 0 and \
+            ((self.value_mask ^ other.value_mask) & self.care_mask) == 0
 
-        self.len = len(self.care)
+    def intersects(self, other: 'Cube') -> bool:
+        return ((self.value_mask ^ other.value_mask) & self.care_mask & other.care_mask) == 0
 
     def __eq__(self, other: object) -> bool:
         # ignores cube id
         if not isinstance(other, Cube):
             return NotImplemented
-        return self.all_literals == other.all_literals
+        return self.care_mask == other.care_mask and self.value_mask == other.value_mask
 
     def __hash__(self):
         # ignores cube id
-        return hash(str(self.all_literals))
+        return hash((self.care_mask, self.value_mask))
 
     def __repr__(self):
-        return '{}: {}'.format(self.id, ''.join(self.all_literals))
+        return '{}: {}'.format(self.id, self.to_str())
     
     def __str__(self):
-        return '{}: {}'.format(self.id, ''.join(self.all_literals))
+        return '{}: {}'.format(self.id, self.to_str())
 
     def pp_care_atom(self, idx: int, literal: str) -> str:
         if literal == '-':
@@ -89,6 +149,8 @@ class PIClass():
     When symmetry is not considered, the class has a single element.
     Otherwise, the class contains a set of equivalent (under symmetry)
     prime implicants, where one of them is a dedicated representative.
+    With a lazy orbit only the representative is stored, the other
+    members are regenerated from it by the symmetry handler when needed.
     """
     _atoms = None
 
@@ -99,6 +161,7 @@ class PIClass():
     def __init__(self, repr_cube: Cube, id: int = 0) -> None:
         self.id = id if id != 0 else repr_cube.id
         self.eq_class: List[Cube] = [repr_cube]
+        self.member_index: Set[Cube] = set([repr_cube])
         self.repr_pi = repr_cube
         self.is_singleton = True
         self.decided = False
@@ -111,6 +174,11 @@ class PIClass():
         self.qcost = 0
         self.quantified_form = ""
 
+        # symmetry handler and size of a lazy orbit
+        self.orbit_handler = None
+        self.orbit_size = 0
+        self.canonical_form: Optional[str] = None
+
         self.analyze_PI()
     
     def analyze_PI(self):
@@ -125,31 +193,78 @@ class PIClass():
 
     def add_equivalent_cube(self, cube: Cube) -> None:
         self.eq_class.append(cube)
+        self.member_index.add(cube)
         self.is_singleton = False
 
+    def set_lazy_orbit(self, dsh, size: Optional[int] = None) -> None:
+        """Replaces the stored members by the orbit of the representative
+        under the symmetries of dsh (a DomainSymmetryHandler). The ids of
+        the members follow the id of the representative.
+        """
+        self.orbit_handler = dsh
+        self.orbit_size = size if size is not None else dsh.orbit_size(self.repr_pi.all_literals)
+        self.eq_class = [self.repr_pi]
+        self.member_index = set([self.repr_pi])
+        self.is_singleton = (self.orbit_size == 1)
+
+    def members(self) -> Iterator[Cube]:
+        if self.orbit_handler is None:
+            yield from self.eq_class
+            return
+        yield self.repr_pi
+        variants = self.orbit_handler.get_symmetric_variants(self.repr_pi.all_literals)
+        for idx,variant in enumerate(variants[1:]):
+            cube = Cube(variant, with_id=False)
+            cube.id = self.repr_pi.id + idx + 1
+            yield cube
+
     @property
     def size(self) -> int:
+        if self.orbit_handler is not None:
+            return self.orbit_size
         return len(self.eq_class)
     
     def has_cube(self, lit_strs: List[str]) -> bool:
-        for cube in self.eq_class:
-            differ = False
-            for l1,l2 in zip(lit_strs,cube.all_literals):
-                if l1 != l2:
-                    differ = True
-                    break
-            if not differ:
-                return True
-        return False
+        if self.orbit_handler is not None:
+            # a lazy orbit is identified by the canonical form of its members
+            if self.canonical_form is None:
+                self.canonical_form = ''.join(self.orbit_handler.canonicalize(self.repr_pi.all_literals))
+            return ''.join(self.orbit_handler.canonicalize(lit_strs)) == self.canonical_form
+        return Cube(lit_strs, with_id=False) in self.member_index
 
     
     def __repr__(self) -> str:
         return '{} : [\n\t{}\n] size {} cost: {} has_const: {} has_all_const: {} singleton: {}\nQuantified form: {} Q-cost: {}'\
-            .format(self.repr_pi,'\n\t'.join([sc.pp_care() for sc in self.eq_class]),\
+            .format(self.repr_pi,'\n\t'.join([sc.pp_care() for sc in self.members()]),\
                 self.size, self.cost, self.has_const, self.has_all_const, self.is_singleton, self.quantified_form,self.qcost)
 
 
-    
-        
+class PIClassRegistry():
+    """An index of PI-classes by the canonical form of their orbit.
+
+    Finding the class of a cube is a single dict lookup, and a list of
+    cubes is split into orbits with one canonicalization per cube.
+    """
+    def __init__(self, dsh) -> None:
+        self.dsh = dsh
+        self.classes: Dict[str, PIClass] = {}
+
+    def get_key(self, lit_strs: List[str]) -> str:
+        return ''.join(self.dsh.canonicalize(lit_strs))
+
+    def add(self, pic: PIClass) -> str:
+        key = self.get_key(pic.repr_pi.all_literals)
+        pic.canonical_form = key
+        self.classes[key] = pic
+        return key
 
+    def find(self, lit_strs: List[str]) -> Optional[PIClass]:
+        return self.classes.get(self.get_key(lit_strs))
 
+    def classify(self, cubes: List[List[str]]) -> Dict[str, List[int]]:
+        # canonical form -> indices of the cubes in the orbit, the orbits
+        # are in the order of their first cube
+        orbits: Dict[str, List[int]] = {}
+        for idx,cube in enumerate(cubes):
+            orbits.setdefault(self.get_key(cube),[]).append(idx)
+        return orbits
@@ -11,11 +11,19 @@
 @Desc    :   None
 '''
 
-from collections import defaultdict
+import os
+import sys
+import time
+import itertools
+import multiprocessing
+import numpy as np
+from collections import defaultdict, OrderedDict
 
-from typing import Dict,Tuple,List,Optional
-from prime_implicants import PIClass, Cube
+from typing import Dict,Tuple,List,Optional,Iterator
+from prime_implicants import PIClass, Cube, PIClassRegistry
 from symmetry import DomainSymmetryHandler
+from orbit_store import OrbitStore
+from decompose import iter_decomposed_pi_classes
 
 from pysat.formula import  CNF # type: ignore
 from pysat.card import ITotalizer # type: ignore
@@ -28,6 +36,26 @@ class DualEncoder():
         self.nof_atoms = len(atom_strs)
         self.topv = 0
         self.verbosity = 1
+        # store only the representative of each PI-class (see PIClass.set_lazy_orbit)
+        self.lazy_orbits = False
+        # enumerate only lex-leader representatives of the orbits
+        self.symmetry_breaking = False
+        # above this group order only the generators get lex-leader constraints
+        self.max_sbp_perms = 128
+        # the enumeration state is saved periodically (seconds) to this file
+        self.checkpoint_path = None
+        self.checkpoint_interval = 60
+        # continue the enumeration from the checkpoint (when it exists)
+        self.resume = False
+        # number of worker processes of the cube-and-conquer enumeration
+        self.parallel = 1
+        # 'totalizer': cardinality sweep, 'minimal': models shrunk to PIs
+        self.pi_engine = 'totalizer'
+        # enumerate the PIs per independent factor of the cubes
+        self.decompose = False
+        # label of the PI counts of a partial enumeration (reduced cubes, a
+        # factor), the totals are printed by the caller
+        self.count_label = ''
         # the domain starts with 0, it is based on the bit position in the state,
         # the range of the varmap starts with 1, odd and even expresses polarity
         # atom 0 -> vars [1,2]
@@ -39,97 +67,583 @@ class DualEncoder():
         self.atom2vars: Dict[int,Dict[int,int]] = defaultdict(dict)
     
     def build_dualrail_clauses(self, cubes: List[str]) -> List[List[int]]:
-        # Encode the negation of each cube with dual-rail encoding -> set of clauses
-        clauses = []
-
+        """Encodes the negation of each cube with dual-rail encoding. The
+        cubes are held as a 2-D uint8 array (self.cube_array) and the
+        literals of all clauses are generated at once: a '0' value of atom idx
+        becomes the positive literal 2*idx+1, a '1' value the negative literal
+        2*idx+2, and don't care values are ignored.
+        """
+        n = self.nof_atoms
         self.atom2vars = defaultdict(dict)
-        for idx in range(self.nof_atoms):
+        for idx in range(n):
             self.atom2vars[idx][1] = (idx)*2+1
             self.atom2vars[idx][0] = (idx)*2+2
-            
-            clauses.append([-1*self.atom2vars[idx][0],-1*self.atom2vars[idx][1]])
-        self.topv = 2*(self.nof_atoms)
-        for cube_str in cubes:
-            cube_clause = []
-            for atom,polarity in enumerate(cube_str):
-                # We negate the values, so polarity is flipped
-                if polarity == '0':
-                    # Add positive literal
-                    cube_clause.append(self.atom2vars[atom][1])
-                elif  polarity == '1':
-                    # Add the negative literal
-                    cube_clause.append(self.atom2vars[atom][0])
-                #case '-': dont care values can be ignored here
-
-            clauses.append(cube_clause)
+        self.topv = 2*n
+
+        self.cube_array = np.frombuffer(''.join(cubes).encode(), dtype=np.uint8).reshape(len(cubes),n)
+        self.pos_vars = 2*np.arange(n, dtype=np.int64)+1
+        # reused by decode_model
+        self.model_buffer = np.empty(n, dtype=np.uint8)
+        # at most one of the two variables of an atom is true
+        clauses = np.stack([-1*(self.pos_vars+1),-1*self.pos_vars], axis=1).tolist()
+        clauses += self.get_array_clauses(self.cube_array, self.pos_vars, self.pos_vars+1)
+        return clauses
+
+    def get_array_clauses(self, cube_array: np.ndarray, zero_lits: np.ndarray, one_lits: np.ndarray) -> List[List[int]]:
+        # One clause per row of the cube array: the literal of atom idx is
+        # zero_lits[idx] or one_lits[idx] for the values '0' and '1'.
+        care = (cube_array != ord('-'))
+        lits = np.where(cube_array == ord('0'), zero_lits, one_lits)[care].tolist()
+        clauses = []
+        begin = 0
+        for end in np.cumsum(care.sum(axis=1)).tolist():
+            clauses.append(lits[begin:end])
+            begin = end
         return clauses
 
+    def get_orbit_blocking_clauses(self, variants: np.ndarray) -> List[List[int]]:
+        # blocking clauses of the cubes of a uint8 array (see get_cube_blocking_clause)
+        return self.get_array_clauses(variants, -1*(self.pos_vars+1), -1*self.pos_vars)
+
+    def decode_model(self, sol: List[int]) -> str:
+        # Variable v is at index v-1 of the model, so the polarities of the
+        # two variables of all atoms are read by two strided views.
+        n = self.nof_atoms
+        model = np.asarray(sol[:2*n])
+        buffer = self.model_buffer
+        buffer.fill(ord('-'))
+        buffer[model[1::2] > 0] = ord('0')
+        buffer[model[0::2] > 0] = ord('1')
+        return buffer.tobytes().decode()
+
+    def get_cube_masks(self) -> List[Tuple[int,int]]:
+        # (care_mask,value_mask) of each cube of self.cube_array, as in Cube
+        care = np.packbits(self.cube_array != ord('-'), axis=1, bitorder='little')
+        value = np.packbits(self.cube_array == ord('1'), axis=1, bitorder='little')
+        return [(int.from_bytes(c.tobytes(),'little'), int.from_bytes(v.tobytes(),'little')) for (c,v) in zip(care,value)]
+
     def pp_dualrail_map(self):
         for idx,atom in enumerate(self.atoms):
             print('{}:  {}\n~{}: {}'.format(atom,self.atom2vars[idx][1],atom,self.atom2vars[idx][0]))
 
+    def build_lex_leader_clauses(self, perms) -> List[List[int]]:
+        """Symmetry-breaking constraints over the dual-rail variables: for each
+        permutation the assignment has to be lexicographically smaller or
+        equal than its permuted assignment. The variables are ordered as
+        [1,2,3,4,...], so the order of the assignments follows the order of
+        the cubes ('-' < '0' < '1').
+        """
+        clauses = []
+        for perm in perms:
+            prefix_eq = None # the permuted prefix equals the original one
+            for idx,val in enumerate(perm):
+                for polarity in [1,0]:
+                    x = self.atom2vars[idx][polarity]
+                    y = self.atom2vars[int(val)][polarity]
+                    if x == y:
+                        continue
+                    guard = [] if prefix_eq is None else [-1*prefix_eq]
+                    clauses.append(guard + [-1*x, y])
+                    self.topv += 1
+                    clauses.append(guard + [-1*x, -1*y, self.topv])
+                    clauses.append(guard + [x, y, self.topv])
+                    prefix_eq = self.topv
+        return clauses
+
+    def get_implicant_conflicts(self, cube: Cube) -> List[int]:
+        # For each input cube the atoms where it conflicts with the given cube.
+        return [cube.care_mask & care & (cube.value_mask ^ value) for (care,value) in self.cube_masks]
+
+    def shrink_to_prime(self, cube: Cube) -> Cube:
+        """Drops literals of an implicant of the negated input cubes until
+        it becomes prime (a literal is needed iff some input cube conflicts
+        with the implicant only on that literal).
+        """
+        conflicts = self.get_implicant_conflicts(cube)
+        needed = 0
+        for conflict in conflicts:
+            if conflict & (conflict-1) == 0:
+                needed |= conflict
+        if needed == cube.care_mask:
+            return cube
+        care_mask = cube.care_mask
+        droppable = care_mask & ~needed
+        while droppable:
+            low_bit = droppable & -droppable
+            droppable ^= low_bit
+            if all([conflict != low_bit for conflict in conflicts]):
+                care_mask ^= low_bit
+                conflicts = [conflict & ~low_bit for conflict in conflicts]
+        return Cube.from_masks(care_mask, cube.value_mask, with_id=False)
+
+    def get_blocking_clause(self, cube: Cube) -> List[int]:
+        return [-1*self.atom2vars[abs(lit)-1][1 if lit > 0 else 0] for lit in cube.care]
+
+    def print_pi_counts(self, pi_count: int, pi_class_count: int) -> None:
+        if self.verbosity > 0:
+            label = ' ({})'.format(self.count_label) if self.count_label else ''
+            print('\tNumber of PIs{}: {}'.format(label,pi_count))
+            print('\tNumber of PI-classes{}: {}'.format(label,pi_class_count))
+
+    def load_checkpoint(self, cube_strs: List[str]) -> Optional[OrbitStore]:
+        if not self.resume or self.checkpoint_path is None or not os.path.isfile(self.checkpoint_path):
+            return None
+        store = OrbitStore.load(self.checkpoint_path, self.atoms)
+        if not store.has_cubes(cube_strs):
+            # written for other reachable states, the enumeration starts over
+            print("Checkpoint {} does not match the input cubes, it is not resumed.".format(self.checkpoint_path), file=sys.stderr)
+            return None
+        if store.symmetry_breaking != self.symmetry_breaking:
+            print("Error: checkpoint {} was written {} --symmetry-breaking.".format(self.checkpoint_path,\
+                "with" if store.symmetry_breaking else "without"))
+            sys.exit(1)
+        if self.verbosity > 0:
+            print('Resuming from {} (ub: {}, PI-classes: {})'.format(self.checkpoint_path,store.ub,len(store.reps)))
+        return store
+
+    def save_checkpoint(self, store: OrbitStore, ub: int) -> None:
+        if self.checkpoint_path is None:
+            return
+        store.ub = ub
+        store.save(self.checkpoint_path)
+
+    def get_cube_blocking_clause(self, c: List[str]) -> List[int]:
+        blocking_clause = []
+        for idx,_ in enumerate(self.atoms):
+            if c[idx] == '1':
+                blocking_clause.append(-1*self.atom2vars[idx][1])
+            elif c[idx] == '0':
+                blocking_clause.append(-1*self.atom2vars[idx][0])
+        return blocking_clause
+
+    def add_pi_class(self, sat_solver, dsh: DomainSymmetryHandler, cube: List[str]) -> PIClass:
+        # Creates the PI-class of cube and blocks every member of its orbit
+        # with one batch of clauses.
+        variants = dsh.get_symmetric_variants_array(np.frombuffer(''.join(cube).encode(), dtype=np.uint8))
+        sat_solver.append_formula(self.get_orbit_blocking_clauses(variants))
+
+        # the cube (first variant) will be the representative of this PI-class
+        pi_class = PIClass(Cube(variants[0].tobytes().decode()))
+        if self.lazy_orbits:
+            Cube.reserve_ids(len(variants)-1)
+            pi_class.set_lazy_orbit(dsh, len(variants))
+        else:
+            for row in variants[1:]:
+                pi_class.add_equivalent_cube(Cube(row.tobytes().decode()))
+        return pi_class
+
+    def add_canonical_pi_class(self, dsh: DomainSymmetryHandler, registry: PIClassRegistry, pi_strs: List[str], key, size: int) -> PIClass:
+        pi_class = PIClass(Cube(pi_strs))
+        Cube.reserve_ids(size-1)
+        pi_class.set_lazy_orbit(dsh, size)
+        pi_class.canonical_form = key
+        registry.classes[key] = pi_class
+        return pi_class
+
+    def iter_canonical_prime_implicant_classes(self, dsh: DomainSymmetryHandler, cube_strs: List[str]) -> Iterator[PIClass]:
+        """PI enumeration with lex-leader symmetry-breaking constraints: the
+        solver returns (mostly) the canonical member of each orbit, which is
+        blocked by a single clause. Members of known orbits that the
+        lex-leader constraints do not exclude are blocked one by one when the
+        solver runs into them, so the number of blocking clauses is below the
+        number of PIs but not bounded by the number of orbits. The orbit sizes
+        are computed by the symmetry handler.
+        """
+        clause_db = self.build_dualrail_clauses(cube_strs)
+        self.cube_masks = self.get_cube_masks()
+
+        n = len(self.atoms)
+        all_literals = list(range(1,self.topv+1))
+        t = ITotalizer(lits=all_literals, ubound=n, top_id=self.topv)
+        clause_db += t.cnf.clauses
+        self.topv = t.top_id
+
+        sbp_perms = dsh.generators
+        if dsh.generators_only == False and len(dsh.perm_table) <= self.max_sbp_perms:
+            sbp_perms = dsh.perm_table[1:]
+        sb_clauses = self.build_lex_leader_clauses(sbp_perms)
+        clause_db += sb_clauses
+        if self.verbosity > 0:
+            print("Dual encoding with symmetry breaking:")
+            print('\tNumber of variables: {}'.format(self.topv))
+            print('\tNumber of clauses: {} (symmetry breaking: {})'.format(len(clause_db),len(sb_clauses)))
+
+        registry = PIClassRegistry(dsh)
+        pi_count = 0
+        pi_class_count = 0
+        blocked_count = 0
+
+        store = self.load_checkpoint(cube_strs)
+        first_ub = 0 if store is None else store.ub
+        if store is None:
+            store = OrbitStore(self.atoms)
+            store.cubes = list(cube_strs)
+            store.symmetry_breaking = True
+
+        with Cadical(bootstrap_with=clause_db) as sat_solver:
+            for blocked in store.blocked:
+                blocked_count += 1
+                sat_solver.add_clause(self.get_blocking_clause(Cube(blocked, with_id=False)))
+            for (rep_str,size) in zip(store.reps,store.sizes):
+                pi_strs = list(rep_str)
+                pi_class_count += 1
+                pi_count += size
+                yield self.add_canonical_pi_class(dsh, registry, pi_strs, registry.get_key(pi_strs), size)
+
+            last_checkpoint = time.time()
+            for ub in range(first_ub,n+1):
+                res = sat_solver.solve(assumptions=[-1*t.rhs[ub]])
+                while (res):
+                    sol = sat_solver.get_model()
+                    cube = self.decode_model(sol)
+
+                    # A model that is not prime (or not a canonical member)
+                    # contains a member of an already found orbit.
+                    pi_cube = self.shrink_to_prime(Cube(cube, with_id=False))
+                    pi_strs = pi_cube.all_literals
+                    key = registry.get_key(pi_strs)
+                    if not key in registry.classes:
+                        size = dsh.orbit_size(pi_strs)
+                        pi_class = self.add_canonical_pi_class(dsh, registry, pi_strs, key, size)
+                        pi_class_count += 1
+                        pi_count += size
+                        store.reps.append(''.join(pi_strs))
+                        store.sizes.append(size)
+                    else:
+                        pi_class = None
+
+                    blocked_count += 1
+                    sat_solver.add_clause(self.get_blocking_clause(pi_cube))
+                    store.blocked.append(pi_cube.to_str())
+                    if time.time() - last_checkpoint >= self.checkpoint_interval:
+                        self.save_checkpoint(store, ub)
+                        last_checkpoint = time.time()
+                    if pi_class is not None:
+                        yield pi_class
+                    res = sat_solver.solve(assumptions=[-1*t.rhs[ub]])
+            self.save_checkpoint(store, n+1)
+
+        self.print_pi_counts(pi_count, pi_class_count)
+        if self.verbosity > 0:
+            print('\tNumber of blocking clauses: {}'.format(blocked_count))
+
+    def get_split_atoms(self, cube_strs: List[str]) -> List[int]:
+        # The atoms that are cared about in the most input cubes, enough of
+        # them to have a few partitions per worker.
+        nof_splits = 0
+        while 3**nof_splits < 4*self.parallel and nof_splits < len(self.atoms):
+            nof_splits += 1
+        occurrences = [0]*len(self.atoms)
+        for cube_str in cube_strs:
+            for idx,lit in enumerate(cube_str):
+                if lit != '-':
+                    occurrences[idx] += 1
+        return sorted(range(len(self.atoms)), key=lambda idx: (-occurrences[idx],idx))[:nof_splits]
+
+    def get_partition_assumptions(self, split_atoms: List[int], partition: Tuple[str]) -> List[int]:
+        assumptions = []
+        for idx,lit in zip(split_atoms,partition):
+            if lit == '-':
+                assumptions += [-1*self.atom2vars[idx][1],-1*self.atom2vars[idx][0]]
+            else:
+                assumptions.append(self.atom2vars[idx][1 if lit == '1' else 0])
+        return assumptions
+
+    def enumerate_partition(self, dsh: DomainSymmetryHandler, assumptions: List[int]) -> List[str]:
+        """Enumerates the PIs that satisfy the assumptions (a partition of the
+        dual-rail search space) and returns the canonical forms of their
+        orbits. The cardinality sweep alone does not guarantee primality here
+        (a shorter PI may be in another partition), so every model is checked
+        against the input cubes; a non-prime model is blocked by itself and a
+        PI by its whole orbit.
+        """
+        n = len(self.atoms)
+        keys = []
+        with Cadical(bootstrap_with=self.partition_clauses) as sat_solver:
+            for ub in range(0,n+1):
+                ub_assumptions = assumptions + [-1*self.partition_rhs[ub]]
+                res = sat_solver.solve(assumptions=ub_assumptions)
+                while (res):
+                    sol = sat_solver.get_model()
+                    cube = self.decode_model(sol)
+                    model_cube = Cube(cube, with_id=False)
+                    if self.shrink_to_prime(model_cube) is model_cube:
+                        keys.append(''.join(dsh.canonicalize(list(cube))))
+                        variants = dsh.get_symmetric_variants_array(np.frombuffer(cube.encode(), dtype=np.uint8))
+                        sat_solver.append_formula(self.get_orbit_blocking_clauses(variants))
+                    else:
+                        sat_solver.add_clause(self.get_cube_blocking_clause(cube))
+                    res = sat_solver.solve(assumptions=ub_assumptions)
+        return keys
+
+    def new_pi_class(self, dsh: DomainSymmetryHandler, cube: List[str]) -> PIClass:
+        if self.lazy_orbits:
+            pi_class = PIClass(Cube(cube))
+            size = dsh.orbit_size(cube)
+            Cube.reserve_ids(size-1)
+            pi_class.set_lazy_orbit(dsh, size)
+            return pi_class
+        cube_class = dsh.get_symmetric_variants(cube)
+        pi_class = PIClass(Cube(cube_class[0]))
+        for c in cube_class[1:]:
+            pi_class.add_equivalent_cube(Cube(c))
+        return pi_class
+
+    def iter_parallel_prime_implicant_classes(self, dsh: DomainSymmetryHandler, cube_strs: List[str]) -> Iterator[PIClass]:
+        """Cube-and-conquer PI enumeration: the search space is split by the
+        values ('-', '0', '1') of the most frequent atoms, and the partitions
+        are enumerated by self.parallel worker processes. The orbits are
+        merged by their canonical forms in the order of the partitions, the
+        ids are given at the merge.
+        """
+        global _partition_encoder, _partition_dsh
+        clause_db = self.build_dualrail_clauses(cube_strs)
+        self.cube_masks = self.get_cube_masks()
+
+        n = len(self.atoms)
+        all_literals = list(range(1,self.topv+1))
+        t = ITotalizer(lits=all_literals, ubound=n, top_id=self.topv)
+        clause_db += t.cnf.clauses
+        self.partition_clauses = clause_db
+        self.partition_rhs = t.rhs
+
+        split_atoms = self.get_split_atoms(cube_strs)
+        partitions = list(itertools.product('-01', repeat=len(split_atoms)))
+        if self.verbosity > 0:
+            print("Dual encoding (cube-and-conquer):")
+            print('\tNumber of variables: {}'.format(self.topv))
+            print('\tNumber of clauses: {}'.format(len(clause_db)))
+            print('\tSplit atoms: {}'.format(' '.join([self.atoms[idx] for idx in split_atoms])))
+            print('\tNumber of partitions: {} (workers: {})'.format(len(partitions),self.parallel))
+
+        pi_count = 0
+        found_keys = set()
+        # The workers are forked, they inherit the encoding and the symmetries.
+        _partition_encoder = self
+        _partition_dsh = dsh
+        with multiprocessing.get_context('fork').Pool(self.parallel) as pool:
+            all_assumptions = [self.get_partition_assumptions(split_atoms,partition) for partition in partitions]
+            for keys in pool.imap(_enumerate_partition, all_assumptions):
+                for key in keys:
+                    if key in found_keys:
+                        continue
+                    found_keys.add(key)
+                    pi_class = self.new_pi_class(dsh, list(key))
+                    pi_count += pi_class.size
+                    yield pi_class
+        _partition_encoder = None
+        _partition_dsh = None
+
+        self.print_pi_counts(pi_count, len(found_keys))
+
+    def iter_minimal_prime_implicant_classes(self, dsh: DomainSymmetryHandler, cube_strs: List[str]) -> Iterator[PIClass]:
+        """PI enumeration without cardinality constraints: each model of the
+        dual-rail clauses is shrunk to a PI (literals are dropped while the
+        cube still conflicts with every input cube), and the orbit of the PI
+        is blocked. A model never contains a blocked cube, so the PI found
+        in it is always from a new orbit. The PIs do not come in the order
+        of their size.
+        """
+        clause_db = self.build_dualrail_clauses(cube_strs)
+        self.cube_masks = self.get_cube_masks()
+        if self.verbosity > 0:
+            print("Dual encoding (minimal models):")
+            print('\tNumber of variables: {}'.format(self.topv))
+            print('\tNumber of clauses: {}'.format(len(clause_db)))
+
+        n = len(self.atoms)
+        pi_count = 0
+        pi_class_count = 0
+        sat_calls = 0
+
+        store = self.load_checkpoint(cube_strs)
+        if store is None:
+            store = OrbitStore(self.atoms)
+            store.cubes = list(cube_strs)
+
+        with Cadical(bootstrap_with=clause_db) as sat_solver:
+            for rep_str in store.reps:
+                pi_class = self.add_pi_class(sat_solver, dsh, list(rep_str))
+                pi_class_count += 1
+                pi_count += pi_class.size
+                yield pi_class
+
+            last_checkpoint = time.time()
+            if store.ub <= n:
+                sat_calls += 1
+                res = sat_solver.solve()
+                while (res):
+                    sol = sat_solver.get_model()
+                    cube = self.decode_model(sol)
+                    cube = self.shrink_to_prime(Cube(cube, with_id=False)).all_literals
+
+                    pi_class_count += 1
+                    pi_class = self.add_pi_class(sat_solver, dsh, cube)
+                    pi_count += pi_class.size
+                    store.reps.append(''.join(cube))
+                    store.sizes.append(pi_class.size)
+                    if time.time() - last_checkpoint >= self.checkpoint_interval:
+                        self.save_checkpoint(store, 0)
+                        last_checkpoint = time.time()
+
+                    yield pi_class
+
+                    sat_calls += 1
+                    res = sat_solver.solve()
+            self.save_checkpoint(store, n+1)
+
+        self.print_pi_counts(pi_count, pi_class_count)
+        if self.verbosity > 0:
+            print('\tNumber of SAT calls: {}'.format(sat_calls))
+
     def extract_prime_implicants(self, dsh: DomainSymmetryHandler, cube_strs: List[str]) -> List[PIClass]:
-        pi_classes = []
-        clause_db = CNF(from_clauses=self.build_dualrail_clauses(cube_strs))
+        return list(self.iter_prime_implicant_classes(dsh, cube_strs))
+
+    def iter_prime_implicant_classes(self, dsh: DomainSymmetryHandler, cube_strs: List[str]) -> Iterator[PIClass]:
+        """Enumerates the PI-classes and yields each of them as soon as its
+        orbit is blocked in the solver.
+        """
+        if self.decompose:
+            yield from iter_decomposed_pi_classes(self, dsh, cube_strs)
+            return
+        if self.symmetry_breaking:
+            yield from self.iter_canonical_prime_implicant_classes(dsh, cube_strs)
+            return
+        if self.parallel > 1:
+            yield from self.iter_parallel_prime_implicant_classes(dsh, cube_strs)
+            return
+        if self.pi_engine == 'minimal':
+            yield from self.iter_minimal_prime_implicant_classes(dsh, cube_strs)
+            return
+        clause_db = self.build_dualrail_clauses(cube_strs)
         if self.verbosity > 0:
             print("Dual encoding:")
             print('\tNumber of variables: {}'.format(self.topv))
-            print('\tNumber of clauses: {}'.format(len(clause_db.clauses)))
+            print('\tNumber of clauses: {}'.format(len(clause_db)))
         
         n = len(self.atoms)
         all_literals = list(range(1,self.topv+1))
         t = ITotalizer(lits=all_literals, ubound=n, top_id=self.topv)
-        clause_db.extend(t.cnf.clauses)
+        clause_db += t.cnf.clauses
 
         pi_count = 0
         pi_class_count = 0
 
+        # The blocked cubes of this mode are the orbits of the representatives.
+        store = self.load_checkpoint(cube_strs)
+        first_ub = 0 if store is None else store.ub
+        if store is None:
+            store = OrbitStore(self.atoms)
+            store.cubes = list(cube_strs)
+
         with Cadical(bootstrap_with=clause_db) as sat_solver:
+            for rep_str in store.reps:
+                pi_class = self.add_pi_class(sat_solver, dsh, list(rep_str))
+                pi_class_count += 1
+                pi_count += pi_class.size
+                yield pi_class
+
+            last_checkpoint = time.time()
             # ub=0 will cover the case when the formula is empty.
-            for ub in range(0,n+1):
+            for ub in range(first_ub,n+1):
                 res = sat_solver.solve(assumptions=[-1*t.rhs[ub]])
                 if self.verbosity > 3: print("(v{} + ... + v{}) <= {}: {}".format(all_literals[0],all_literals[-1],ub,res))
                 while (res):
                     sol = sat_solver.get_model()
-                    cube = ['-']*n
-                
-                    for idx,atom in enumerate(self.atoms):
-                        if self.atom2vars[idx][1] in sol:
-                            cube[idx] = '1'
-
-                        elif self.atom2vars[idx][0] in sol:
-                            cube[idx] = '0'
+                    cube = self.decode_model(sol)
                     pi_class_count += 1
-                    cube_class = dsh.get_symmetric_variants(cube)
-                    
-                    pi_class = None
-                    for c in cube_class:
-                        pi_count += 1
-                        blocking_clause = []
-                        for idx,_ in enumerate(self.atoms):
-                            if c[idx] == '1':
-                                blocking_clause.append(-1*self.atom2vars[idx][1])
-                            elif c[idx] == '0':
-                                blocking_clause.append(-1*self.atom2vars[idx][0])
-                        pi_cube = Cube(c)
-                        
-                        if pi_class is None:
-                            # pi_cube will be the representative of this PI-class
-                            pi_class = PIClass(pi_cube)
-                        else:
-                            pi_class.add_equivalent_cube(pi_cube)
-
-                        sat_solver.add_clause(blocking_clause)
-                    
-                    pi_classes.append(pi_class)
+                    pi_class = self.add_pi_class(sat_solver, dsh, cube)
+                    pi_count += pi_class.size
+                    store.reps.append(''.join(cube))
+                    store.sizes.append(pi_class.size)
+                    if time.time() - last_checkpoint >= self.checkpoint_interval:
+                        self.save_checkpoint(store, ub)
+                        last_checkpoint = time.time()
+
+                    yield pi_class
 
                     res = sat_solver.solve(assumptions=[-1*t.rhs[ub]])                                            
+            self.save_checkpoint(store, n+1)
                 
-        if self.verbosity > 0:
-            print('\tNumber of PIs: {}'.format(pi_count))
-            print('\tNumber of PI-classes: {}'.format(pi_class_count))
-        
-        return pi_classes
+        self.print_pi_counts(pi_count, pi_class_count)
+
+
+_partition_encoder = None
+_partition_dsh = None
+
+def _enumerate_partition(assumptions: List[int]) -> List[str]:
+    # worker of DualEncoder.iter_parallel_prime_implicant_classes
+    return _partition_encoder.enumerate_partition(_partition_dsh, assumptions)
+
+
+class SATQueryCache():
+    """ Results of the solve calls of a CoverTable, keyed by the pid of
+        the PI whose care literals are assumed and the set of selectors
+        (PI activation variables, as a bitset over the PIs) of the
+        assumptions, with least recently used eviction above
+        max_size_mb.
+
+        For the same PI more selectors mean more clauses, so an UNSAT
+        result carries over to the supersets of its selectors and a SAT
+        result to the subsets. The selectors of the last UNSAT and the
+        last SAT query of each PI are checked for that when there is no
+        exact hit.
+    """
+    def __init__(self, pids: List[int], max_size_mb: int = 256) -> None:
+        self.max_size = max_size_mb * 1024 * 1024
+        # pid -> its bit in the selector bitsets
+        self.selector_bits = {pid: 1 << idx for idx,pid in enumerate(pids)}
+        self.entries: OrderedDict = OrderedDict()
+        # pid -> selectors of its last UNSAT and SAT query
+        self.last_unsat: Dict[int, int] = {}
+        self.last_sat: Dict[int, int] = {}
+        self.size = 0
+
+        self.hits = 0
+        self.monotone_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_selectors(self, pids: List[int]) -> int:
+        selectors = 0
+        for pid in pids:
+            selectors |= self.selector_bits[pid]
+        return selectors
+
+    def get_entry_size(self, selectors: int) -> int:
+        # the selectors bitset, the key tuple and the dictionary slot
+        return (selectors.bit_length() >> 3) + 160
+
+    def lookup(self, key: Tuple[int,int]) -> Optional[bool]:
+        res = self.entries.get(key)
+        if res is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return res
+        (pid,selectors) = key
+        unsat_selectors = self.last_unsat.get(pid)
+        if unsat_selectors is not None and unsat_selectors & ~selectors == 0:
+            self.monotone_hits += 1
+            return False
+        sat_selectors = self.last_sat.get(pid)
+        if sat_selectors is not None and selectors & ~sat_selectors == 0:
+            self.monotone_hits += 1
+            return True
+        self.misses += 1
+        return None
+
+    def store(self, key: Tuple[int,int], res: bool) -> None:
+        (pid,selectors) = key
+        if res:
+            self.last_sat[pid] = selectors
+        else:
+            self.last_unsat[pid] = selectors
+        self.entries[key] = res
+        self.size += self.get_entry_size(selectors)
+        while self.size > self.max_size:
+            ((_,old_selectors),_) = self.entries.popitem(last=False)
+            self.size -= self.get_entry_size(old_selectors)
+            self.evictions += 1
 
 
 class CoverTable():
@@ -147,23 +661,48 @@ class CoverTable():
         self.all_PIs: Dict[int, PIClass] = {}
         self.max_input_var = max_input_var
 
+        # packed care and value masks of every member with the pid of its
+        # class, for the PI-overlap graph
+        nof_bytes = (max_input_var + 7) // 8
+        member_pids = []
+        member_masks = []
         
         self.topv = 0
         for pic in PIcs:
             act_var = pic.id
             self.topv = act_var if act_var > self.topv else self.topv
             self.all_PIs[act_var] = pic
-            for cube in pic.eq_class:
+            for cube in pic.members():
 
                 self.sat_solver.add_clause([-1*act_var] + cube.care_neg[::])
                 if self.v > 4: print([-1*act_var] + cube.care_neg[::])
+                member_pids.append(act_var)
+                member_masks.append(cube.care_mask.to_bytes(nof_bytes,'little') + cube.value_mask.to_bytes(nof_bytes,'little'))
         self.sat_calls = 0
 
+        masks = np.frombuffer(b''.join(member_masks), dtype=np.uint8).reshape(len(member_masks),2*nof_bytes)
+        self.member_care = masks[:,:nof_bytes]
+        self.member_value = masks[:,nof_bytes:]
+        self.member_pids = np.array(member_pids, dtype=np.int64)
+        # pid -> pids of the classes with a member that intersects the repr.
+        # PI (computed on demand)
+        self.overlaps: Dict[int, frozenset] = {}
+        # pid -> (selected overlapping pids, covered, coverage) of the last
+        # covered check
+        self.covered_cache: Dict[int, Tuple[frozenset,bool,int]] = {}
+        self.cached_checks = 0
+        # memoized solve results (SATQueryCache), set by the Minimizer
+        self.query_cache = None
+        # pid -> selectors of the UNSAT core of its last essential check
+        self.cores: Dict[int, frozenset] = {}
+        self.core_skips = 0
+        self.last_core = None
+
 
     def print_CNF(self,path_to_CNF):
         formula = CNF()
         for pid,pic in self.all_PIs.items():
-            for cube in pic.eq_class:
+            for cube in pic.members():
                 formula.append([-1*pid] + cube.care_neg[::])
         formula.to_file(path_to_CNF)
                 
@@ -196,7 +735,7 @@ class CoverTable():
         clean_sat_solver = Cadical()
         clean_full_sat_solver = Cadical()
         for pid,pic in self.all_PIs.items():
-            for cube in pic.eq_class:
+            for cube in pic.members():
                 if pid in selectors:
                     clean_sat_solver.add_clause(cube.care_neg[::])
                 clean_full_sat_solver.add_clause(cube.care_neg[::])
@@ -238,42 +777,111 @@ class CoverTable():
         print("Number of solutions of selected PIs: ",m_count)
         return (ref_count == m_count)
 
-    def solve(self, assume: List[int]) -> bool:
+    def solve(self, assume: List[int], key: Optional[Tuple[int,int]] = None) -> bool:
+        # key: (pid of the assumed care literals, selectors bitset) of the
+        # assumptions when the result can be memoized in query_cache
+        self.last_core = None
+        if key is not None and self.query_cache is not None:
+            res = self.query_cache.lookup(key)
+            if res is not None:
+                return res
         res = self.sat_solver.solve(assumptions = assume)
         self.sat_calls += 1
+        if key is not None and self.query_cache is not None:
+            self.query_cache.store(key, res)
+        self.last_core = None if res else self.sat_solver.get_core()
+
+        return res
+
+    def is_certified_covered(self, pid: int, selected: set) -> bool:
+        # The selectors of the last UNSAT core of pid cover it, so it stays
+        # covered while they are all selected.
+        core = self.cores.get(pid)
+        if core is not None and core <= selected:
+            self.core_skips += 1
+            return True
+        return False
 
+    def is_essential(self, pid: int, selected: set) -> bool:
+        # Is there a minterm of the repr. PI of pid that is not covered by
+        # the selected PIs (without pid). Only the selected PIs that overlap
+        # the repr. PI are assumed, the clauses of the others are satisfied
+        # by its care literals anyway.
+        if self.is_certified_covered(pid, selected):
+            return False
+        others = [other_pid for other_pid in self.get_overlapping_pids(pid) if other_pid != pid and other_pid in selected]
+        assume = self.all_PIs[pid].repr_pi.care + others
+        res = self.solve(assume, self.get_query_key(pid, self.get_selectors(others)))
+        self.store_core(pid)
         return res
 
+    def store_core(self, pid: int) -> None:
+        if self.last_core is not None:
+            self.cores[pid] = frozenset([lit for lit in self.last_core if lit > self.max_input_var])
+
     def get_root_essentials(self) -> List[int]:
         essentials = []
-        for pid,pic in self.all_PIs.items():
-            u_part = [other_pid for other_pid in self.all_PIs.keys() if other_pid != pid]
-            assume = pic.repr_pi.care + u_part
-            res = self.solve(assume)
-            if res:
+        selected = set(self.all_PIs.keys())
+        for pid in self.all_PIs.keys():
+            if self.is_essential(pid, selected):
                 essentials.append(pid)
     
         return essentials
 
+    def get_selectors(self, pids: List[int]) -> int:
+        if self.query_cache is None:
+            return 0
+        return self.query_cache.get_selectors(pids)
+
+    def get_query_key(self, pid: int, selectors: int) -> Optional[Tuple[int,int]]:
+        # the key of the check of pid with the selectors in query_cache
+        if self.query_cache is None:
+            return None
+        return (pid,selectors)
+
+    def get_overlapping_pids(self, pid: int) -> frozenset:
+        if not pid in self.overlaps:
+            nof_bytes = self.member_care.shape[1]
+            repr_pi = self.all_PIs[pid].repr_pi
+            care = np.frombuffer(repr_pi.care_mask.to_bytes(nof_bytes,'little'), dtype=np.uint8)
+            value = np.frombuffer(repr_pi.value_mask.to_bytes(nof_bytes,'little'), dtype=np.uint8)
+            conflict = (self.member_care & care & (self.member_value ^ value)).any(axis=1)
+            self.overlaps[pid] = frozenset(self.member_pids[~conflict].tolist())
+        return self.overlaps[pid]
+
     def remove_covered_pis(self, ptrail, unk, trail):
         # Move PIs of unk to trail that are fully covered by ptrail.
+        # Only the selected PIs that overlap a PI can cover it or change its
+        # coverage, so the result of the last check is reused as long as
+        # these are the same.
         covered = []
         new_unk = []
         maxvar = self.max_input_var
+        selected = set(ptrail)
         
         for pid in unk:
-            assume = self.all_PIs[pid].repr_pi.care + ptrail
-            res = self.solve(assume)
+            key = self.get_overlapping_pids(pid) & selected
+            if pid in self.covered_cache and self.covered_cache[pid][0] == key:
+                self.cached_checks += 1
+                (_, is_covered, coverage) = self.covered_cache[pid]
+            else:
+                others = list(key)
+                assume = self.all_PIs[pid].repr_pi.care + others
+                is_covered = not self.solve(assume, self.get_query_key(pid, self.get_selectors(others)))
+                coverage = 0
+                if is_covered:
+                    self.store_core(pid)
+                else:
+                    res, assigned = self.sat_solver.propagate(assume)
+                    coverage = len([p for p in assigned if (-maxvar <= p and p <= maxvar)])
+                self.covered_cache[pid] = (key, is_covered, coverage)
             
-            if not res:
+            if is_covered:
                 trail.append(-1*pid)
                 covered.append(pid)
             else:
                 new_unk.append(pid)
-                res, coverage = self.sat_solver.propagate(assume)
-                
-                relevant_coverage = [p for p in coverage if (-maxvar <= p and p <= maxvar)]
-                self.all_PIs[pid].coverage = len(relevant_coverage)
+                self.all_PIs[pid].coverage = coverage
                 
         if covered:
             unk[:] = new_unk
@@ -286,15 +894,12 @@ class CoverTable():
             return []
         essentials = []
         new_unk = []
-        # pySAT does not like duplicated assumption, ptrail gets some of the unk
-        # pids during the loop, so we have to use the original (disjoint) ptrail
-        # and unk in the assumption building.
-        p_part = ptrail[:]
+        # ptrail gets some of the unk pids during the loop, so we have to use
+        # the original ptrail and unk in the assumption building.
+        selected = set(ptrail) | set(unk)
 
         for pid in unk:
-            u_part = [other_pid for other_pid in unk if other_pid != pid]
-            assume = self.all_PIs[pid].repr_pi.care + p_part + u_part
-            res = self.solve(assume)
+            res = self.is_essential(pid, selected)
             if res:
                 essentials.append(pid)
                 trail.append(pid)
@@ -308,3 +913,141 @@ class CoverTable():
         return essentials
 
 
+class BitsetCoverTable(CoverTable):
+    """ The cover table of CoverTable with explicit minterms, for instances
+        with few input variables: each PI-class is the set of minterms
+        of its members, stored as a bitset (Python int with a bit per
+        assignment of the max_input_var variables). The covered and
+        essential checks are bitwise operations instead of SAT calls.
+    """
+    def __init__(self, PIcs : PIClass, max_input_var: int) -> None:
+        self.v = 0
+        self.sat_solver = None
+        self.all_PIs: Dict[int, PIClass] = {}
+        self.max_input_var = max_input_var
+        self.sat_calls = 0
+        self.bitset_ops = 0
+        self.query_cache = None
+        self.cores: Dict[int, frozenset] = {}
+        self.core_skips = 0
+        self.last_core = None
+
+        # pid -> minterms of the class, minterms of its representative
+        self.class_bits: Dict[int, int] = {}
+        self.repr_bits: Dict[int, int] = {}
+        self.topv = 0
+        for pic in PIcs:
+            act_var = pic.id
+            self.topv = act_var if act_var > self.topv else self.topv
+            self.all_PIs[act_var] = pic
+            bits = 0
+            for cube in pic.members():
+                bits |= self.get_cube_bits(cube)
+            self.class_bits[act_var] = bits
+            self.repr_bits[act_var] = self.get_cube_bits(pic.repr_pi)
+
+    def get_cube_bits(self, cube: Cube) -> int:
+        # Minterm m (bit idx of m is the value of atom idx) is in the cube iff
+        # m & care_mask == value_mask, built up one atom at a time.
+        bits = 1
+        for idx in range(self.max_input_var):
+            atom_bit = 1 << idx
+            if cube.care_mask & atom_bit:
+                if cube.value_mask & atom_bit:
+                    bits <<= atom_bit
+            else:
+                bits |= bits << atom_bit
+        return bits
+
+    def get_union(self, pids: List[int]) -> int:
+        bits = 0
+        for pid in pids:
+            bits |= self.class_bits[pid]
+        self.bitset_ops += len(pids)
+        return bits
+
+    def get_exclusive_unions(self, pids: List[int]) -> List[int]:
+        # The union of all classes of pids but the i-th, for each i, from
+        # prefix and suffix unions.
+        suffix = [0]*(len(pids)+1)
+        for idx in range(len(pids)-1,-1,-1):
+            suffix[idx] = suffix[idx+1] | self.class_bits[pids[idx]]
+        unions = []
+        prefix = 0
+        for idx,pid in enumerate(pids):
+            unions.append(prefix | suffix[idx+1])
+            prefix |= self.class_bits[pid]
+        self.bitset_ops += 3*len(pids)
+        return unions
+
+    def solve(self, assume: List[int], key: Optional[Tuple[int,int]] = None) -> bool:
+        # The SAT check of CoverTable on the bitsets: is there a minterm of
+        # the literals of assume that is not covered by its PI-classes (no
+        # query cache and no cores, key is ignored).
+        self.last_core = None
+        pids = [lit for lit in assume if lit > self.max_input_var]
+        lits = [lit for lit in assume if -self.max_input_var <= lit and lit <= self.max_input_var]
+        cube_str = ['-']*self.max_input_var
+        for lit in lits:
+            cube_str[abs(lit)-1] = '1' if lit > 0 else '0'
+        return (self.get_cube_bits(Cube(cube_str, with_id=False)) & ~self.get_union(pids)) != 0
+
+    def is_essential(self, pid: int, selected: set) -> bool:
+        others = [other_pid for other_pid in selected if other_pid != pid]
+        return (self.repr_bits[pid] & ~self.get_union(others)) != 0
+
+    def get_root_essentials(self) -> List[int]:
+        essentials = []
+        pids = list(self.all_PIs.keys())
+        for pid,others in zip(pids,self.get_exclusive_unions(pids)):
+            if self.repr_bits[pid] & ~others:
+                essentials.append(pid)
+
+        return essentials
+
+    def remove_covered_pis(self, ptrail, unk, trail):
+        # Move PIs of unk to trail that are fully covered by ptrail. The
+        # coverage grows as the uncovered part of the PI shrinks (as the
+        # number of propagated literals of CoverTable).
+        covered = []
+        new_unk = []
+        selected = self.get_union(ptrail)
+        nof_minterms = 1 << self.max_input_var
+
+        for pid in unk:
+            uncovered = self.repr_bits[pid] & ~selected
+            if not uncovered:
+                trail.append(-1*pid)
+                covered.append(pid)
+            else:
+                new_unk.append(pid)
+                self.all_PIs[pid].coverage = nof_minterms - uncovered.bit_count()
+
+        if covered:
+            unk[:] = new_unk
+
+        return covered
+
+    def move_conditional_essentials(self, ptrail, unk, trail) -> List[int]:
+        if len(ptrail) == len(trail):
+            # We need some removed PIs to have a chance of new essentials to arise
+            return []
+        essentials = []
+        new_unk = []
+        # the unions of ptrail and unk are taken before any of the unk
+        # pids moves to ptrail (as the assumptions of CoverTable)
+        selected = self.get_union(ptrail)
+
+        for pid,others in zip(unk,self.get_exclusive_unions(unk)):
+            if self.repr_bits[pid] & ~(selected | others):
+                essentials.append(pid)
+                trail.append(pid)
+                ptrail.append(pid)
+            else:
+                new_unk.append(pid)
+
+        if essentials:
+            unk[:] = new_unk
+
+        return essentials
+
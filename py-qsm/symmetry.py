@@ -11,8 +11,13 @@
 @Desc    :   None
 '''
 
+import os
 import sys
+import json
+import hashlib
+import numpy as np
 from math import comb
+from pysat.solvers import Cadical # type: ignore
 from itertools import count, permutations, product, combinations
 
 from typing import Dict,Tuple,List,Optional
@@ -34,7 +39,7 @@ class DomainSymmetryHandler():
     quorum_superset_sorts = ['node','acceptor']
 
     # @profile
-    def __init__(self, domains, predicates, atoms, symmetric: bool = True) -> None:
+    def __init__(self, domains, predicates, atoms, symmetric: bool = True, generators_only: bool = False, perm_cache = None) -> None:
         self.sort_names = list(domains.keys())
         self.domains = domains
         self.v = 0
@@ -42,7 +47,15 @@ class DomainSymmetryHandler():
             self.domains[k] = sorted(v)
 
         # by default only identity applies
-        self.perm_table = []
+        # (|G| x n contiguous int32 array, row i gives the source position of each bit)
+        self.perm_table = np.empty((0,len(atoms)), dtype=np.int32)
+        # a small generating set of the group (as atom permutations),
+        # the closure of these gives back every row of perm_table
+        self.generators: List[List[int]] = []
+        self.generators_only = generators_only
+        self.symmetric = symmetric
+        self.predicates = predicates
+        self.atoms = atoms
         if self.v > 4: print('Atoms: {}\n Predicates: {}'.format(atoms,predicates))
                 
         # 1. Check & Handle Quroum sub-sorts:
@@ -53,74 +66,189 @@ class DomainSymmetryHandler():
         self.superset_sort: Optional[str] = None
         
         self.super_set_elements: Optional[List[str]] = None
+        self.super_set_id = -1
 
         self.setup_quorums()
         if self.v > 3: print('Quorum sort: ',self.quorum_sort)
 
+        # Hashed indexes of sorts, elements and atoms.
+        self.sort_ids: Dict[str,int] = {}
+        self.elem_ids: Dict[str,Dict[str,int]] = {}
+        self.quorum_ids: Dict[str,int] = {}
+        self.ss_ids: Dict[str,int] = {}
+        # Integer view of the atoms: every argument is a (sort-id, element-id)
+        # pair, where quorum arguments have sort-id -1 and the quorum-id as
+        # element-id.
+        self.atom_args: List[Tuple[str, Tuple[Tuple[int,int], ...]]] = []
+        self.atom_ids: Dict[Tuple[str, Tuple[int, ...]],int] = {}
+        self.quorum_members: List[Tuple[int, ...]] = []
+        self.quorum_of_members: Dict[Tuple[int, ...],int] = {}
+        # For each predicate: its atom positions, the sort-id of each argument,
+        # the element-ids of the arguments of its atoms and an array mapping
+        # element-ids back to atom positions.
+        self.pred_layout: List[Tuple[np.ndarray, List[int], np.ndarray, np.ndarray]] = []
+        # Integer action tables: every permutation of every sort and the
+        # permutation of the quorums induced by each superset permutation.
+        self.sort_actions: List[np.ndarray] = []
+        self.quorum_action: Optional[np.ndarray] = None
+        self.transpositions: Optional[List[Dict[Tuple[int,int],List[int]]]] = None
+        self.setup_indexes()
+
         # When symmetry awareness is turned off, the only action
         # applied to any cube is the id permutation, i.e.
         # the perm-table has a single row with the original order.
         if not symmetric:
-            self.perm_table = [list(range(len(atoms)))]
+            self.generators_only = False
+            self.perm_table = np.arange(len(atoms), dtype=np.int32).reshape(1,len(atoms))
             self.print_stats(atoms)
             return        
+        for perm in self.get_sort_generators():
+            permuted_atom_positions = self.permute_atoms(perm)
+            if permuted_atom_positions != list(range(len(atoms))) and \
+                not permuted_atom_positions in self.generators:
+                self.generators.append(permuted_atom_positions)
+
+        if self.generators_only:
+            # The orbits are computed on demand by closure over the generators.
+            self.print_stats(atoms)
+            return
+
+        cache_key = None
+        if perm_cache is not None:
+            cache_key = perm_cache.get_key(predicates, atoms, self.get_domain_sizes())
+            cached_table = perm_cache.load(cache_key)
+            if cached_table is not None and cached_table.shape[1] == len(atoms):
+                self.perm_table = cached_table
+                self.print_stats(atoms)
+                return
+
         # Each permutation of the domain elements yields
         # a permutation of the bits of a state.
-        all_perms = []
-        super_set_id = -1
-        for s_idx,(sort_name,domain) in enumerate(self.domains.items()):
-            all_perms.append(permutations(list(range(len(domain)))))
-            if self.has_quorum and sort_name == self.superset_sort:
-                super_set_id = s_idx
-                super_set_elements = list(sorted(domain))
-            
-        for pidx,perm in enumerate(product(*all_perms)):
-            
-            if self.has_quorum:
-                if self.v > 4: print('{:<4} {}'.format(pidx,perm),end=' ')
-                permuted_quorum = []
-                for majority,q_idx in self.quorum_map.items():
-                    permuted_majority = []
-                    for m in majority:
-                        ss_pos = self.get_ss_id(m)
-                        perm_ss_pos = perm[super_set_id][ss_pos]
-                        permuted_majority.append(super_set_elements[perm_ss_pos])
-                    permuted_quorum.append(self.get_quorum_id(permuted_majority))
-                if self.v > 4: print('{}'.format(tuple(permuted_quorum)))
-                
-            
-            permuted_atom_positions = []
-            for (pred,args) in atoms:
-                permuted_args = []
-                for arg_idx,(arg,arg_sort) in enumerate(zip(args,predicates[pred])):
-                    permuted_arg = None
-                    if arg_sort == self.quorum_sort:
-                        permuted_arg = self.quorum_names[permuted_quorum[self.quorum_names.index(arg)]]
-                    else:
-                        sort_id = self.get_sort_id(arg_sort)
-                        original_id = self.get_elem_id(arg_sort,arg)
-                        permuted_id = perm[sort_id][original_id]
-                        permuted_arg = self.get_elem(arg_sort,permuted_id)
-                    permuted_args.append(permuted_arg)
-                permuted_atom_id = atoms.index((pred,permuted_args))
-                if self.v > 4: print(pred,args,'->',permuted_args,permuted_atom_id)
-                permuted_atom_positions.append(permuted_atom_id)
-            if self.v > 3: print(permuted_atom_positions)
-            self.perm_table.append(permuted_atom_positions)
+        self.setup_action_tables()
+        group_order = 1
+        for action in self.sort_actions:
+            group_order *= len(action)
+        self.perm_table = np.empty((group_order,len(atoms)), dtype=np.int32)
+        for pidx,rows in enumerate(product(*[range(len(action)) for action in self.sort_actions])):
+            elem_perms = [action[r] for (action,r) in zip(self.sort_actions,rows)]
+            quorum_perm = self.quorum_action[rows[self.super_set_id]] if self.has_quorum else None
+            if self.v > 4: print('{:<4} {}'.format(pidx,rows),end=' ')
+            self.perm_table[pidx] = self.compose_atom_permutation(elem_perms, quorum_perm)
+            if self.v > 3: print(self.perm_table[pidx])
 
+        if perm_cache is not None:
+            perm_cache.store(cache_key, self.perm_table)
         self.print_stats(atoms)
 
+    def get_sort_generators(self) -> List[Tuple[Tuple[int, ...], ...]]:
+        """Returns a generating set of the product of the symmetric groups of
+        the sorts: for each sort the transposition of the first two elements
+        and the cycle over all elements (the other sorts are left unchanged).
+        """
+        identity = [tuple(range(len(domain))) for domain in self.domains.values()]
+        sort_generators = []
+        for s_idx,domain in enumerate(self.domains.values()):
+            size = len(domain)
+            if size < 2:
+                continue
+            transposition = list(range(size))
+            transposition[0], transposition[1] = 1, 0
+            elem_perms = [tuple(transposition)]
+            if size > 2:
+                elem_perms.append(tuple(list(range(1,size)) + [0]))
+            for elem_perm in elem_perms:
+                perm = identity[::]
+                perm[s_idx] = elem_perm
+                sort_generators.append(tuple(perm))
+        return sort_generators
+
+    def permute_atoms(self, perm) -> List[int]:
+        """Returns the new position of each atom under the given combination
+        of domain permutations (one permutation per sort, the quorum sort
+        follows the permutation of its superset sort).
+        """
+        elem_perms = [np.array(elem_perm, dtype=np.int32) for elem_perm in perm]
+        quorum_perm = None
+        if self.has_quorum:
+            quorum_perm = np.array(self.get_quorum_perm(perm[self.super_set_id]), dtype=np.int32)
+            if self.v > 4: print('{}'.format(tuple(quorum_perm)))
+        return self.compose_atom_permutation(elem_perms, quorum_perm).tolist()
+
+    def compose_atom_permutation(self, elem_perms: List[np.ndarray], quorum_perm: Optional[np.ndarray]) -> np.ndarray:
+        # Vectorized over the atoms of each predicate: the element-ids of the
+        # arguments are permuted and mapped back to atom positions.
+        permuted_atom_positions = np.empty(len(self.atoms), dtype=np.int32)
+        for (atom_idxs,arg_sorts,arg_ids,lookup) in self.pred_layout:
+            permuted_args = []
+            for arg_idx,s_idx in enumerate(arg_sorts):
+                if s_idx == -1:
+                    permuted_args.append(quorum_perm[arg_ids[:,arg_idx]])
+                else:
+                    permuted_args.append(elem_perms[s_idx][arg_ids[:,arg_idx]])
+            permuted_atom_positions[atom_idxs] = lookup[tuple(permuted_args)]
+        if (permuted_atom_positions < 0).any():
+            sys.exit('Error, the set of atoms is not closed under the permutation of the domains.')
+        return permuted_atom_positions
+
+    def get_quorum_perm(self, ss_perm) -> List[int]:
+        return [self.quorum_of_members[tuple(sorted([ss_perm[m] for m in members]))] for members in self.quorum_members]
+
+    def setup_indexes(self):
+        self.sort_ids = {sort_name:s_idx for s_idx,sort_name in enumerate(self.sort_names)}
+        self.elem_ids = {sort_name:{elem:e_id for e_id,elem in enumerate(domain)} for sort_name,domain in self.domains.items()}
+        self.quorum_ids = {name:q_idx for q_idx,name in enumerate(self.quorum_names)}
+        if self.has_quorum:
+            self.ss_ids = {elem:ss_id for ss_id,elem in enumerate(self.super_set_elements)}
+            self.super_set_id = self.sort_ids[self.superset_sort]
+        for majority,q_idx in sorted(self.quorum_map.items(), key=lambda item: item[1]):
+            members = tuple([self.get_ss_id(m) for m in majority])
+            self.quorum_members.append(members)
+            self.quorum_of_members[members] = q_idx
+
+        pred_atoms: Dict[str,List[int]] = {}
+        for (pred,args) in self.atoms:
+            arg_ids = []
+            for arg,arg_sort in zip(args,self.predicates[pred]):
+                if arg_sort == self.quorum_sort:
+                    arg_ids.append((-1,self.quorum_ids[arg]))
+                else:
+                    arg_ids.append((self.get_sort_id(arg_sort),self.get_elem_id(arg_sort,arg)))
+            self.atom_args.append((pred,tuple(arg_ids)))
+            self.atom_ids[(pred,tuple([e_id for (_,e_id) in arg_ids]))] = len(self.atom_args) - 1
+            pred_atoms.setdefault(pred,[]).append(len(self.atom_args) - 1)
+
+        for pred,atom_idxs in pred_atoms.items():
+            arg_sorts = [s_idx for (s_idx,_) in self.atom_args[atom_idxs[0]][1]]
+            shape = [len(self.quorum_names) if s_idx == -1 else len(self.domains[self.sort_names[s_idx]]) for s_idx in arg_sorts]
+            arg_ids = np.array([[e_id for (_,e_id) in self.atom_args[idx][1]] for idx in atom_idxs], dtype=np.int32).reshape(len(atom_idxs),len(arg_sorts))
+            lookup = np.full(shape, -1, dtype=np.int32)
+            for atom_idx,ids in zip(atom_idxs,arg_ids):
+                lookup[tuple(ids)] = atom_idx
+            self.pred_layout.append((np.array(atom_idxs, dtype=np.int32),arg_sorts,arg_ids,lookup))
+
+    def setup_action_tables(self):
+        self.sort_actions = []
+        for domain in self.domains.values():
+            size = len(domain)
+            self.sort_actions.append(np.array(list(permutations(range(size))), dtype=np.int32).reshape(-1,size))
+        if self.has_quorum:
+            ss_action = self.sort_actions[self.super_set_id]
+            self.quorum_action = np.array([self.get_quorum_perm(ss_perm) for ss_perm in ss_action], dtype=np.int32).reshape(len(ss_action),len(self.quorum_members))
+
+    def get_domain_sizes(self) -> Dict[str,int]:
+        sizes = {sort_name:len(domain) for sort_name,domain in self.domains.items()}
+        if self.has_quorum:
+            sizes[self.quorum_sort] = len(self.quorum_names)
+        return sizes
+
     def get_sort_id(self, sort_name: str) -> int:
-        return self.sort_names.index(sort_name)
+        return self.sort_ids[sort_name]
     def get_elem_id(self, sort_name: str, elem: str) -> int:
-        return self.domains[sort_name].index(elem)
+        return self.elem_ids[sort_name][elem]
     def get_elem(self, sort_name: str, id: int) -> str:
         return self.domains[sort_name][id]
     def get_ss_id(self, ss_elem: str) -> int:
-        if self.super_set_elements:
-            return self.super_set_elements.index(ss_elem)
-        else:
-            return -1
+        return self.ss_ids.get(ss_elem,-1)
     def get_quorum_id(self, ss_list: List[str]) -> int:
         return self.quorum_map[tuple(sorted(ss_list))]
     def print_stats(self, atoms):
@@ -129,7 +257,8 @@ class DomainSymmetryHandler():
             for (pidx,permuted_ids) in enumerate(self.perm_table):
                 print('{} {}'.format(pidx,permuted_ids))
         if self.v > 1:
-            print('Length of permutation table: {}'.format(len(self.perm_table)))                
+            print('Length of permutation table: {}'.format(len(self.perm_table)))
+            print('Number of generators: {}'.format(len(self.generators)))                
     def setup_quorums(self):
         for sort in DomainSymmetryHandler.quorum_superset_sorts:
             if sort in self.sort_names:
@@ -170,44 +299,262 @@ class DomainSymmetryHandler():
         self.sort_names = list(self.domains.keys())
     
     def get_symmetric_variants(self, cube: list):
-        eq_set = set()
-        cube_eq_class = []
+        if self.generators_only:
+            return self.get_orbit_closure(cube)
+        cube_arr = np.frombuffer(''.join(cube).encode(), dtype=np.uint8)
+        return [list(row.tobytes().decode()) for row in self.get_symmetric_variants_array(cube_arr)]
+
+    def get_symmetric_variants_array(self, cube_arr: np.ndarray) -> np.ndarray:
+        """Returns the distinct variants of a cube (uint8 array of characters)
+        as the rows of a uint8 array, the first row is the cube itself.
+        """
+        if self.generators_only:
+            orbit = self.get_orbit_closure(list(cube_arr.tobytes().decode()))
+            return np.frombuffer(''.join([''.join(c) for c in orbit]).encode(), dtype=np.uint8).reshape(len(orbit),len(cube_arr))
+        # one gather produces every variant, rows are deduplicated
+        # by their bytes and kept in the order of the perm-table.
+        variants = cube_arr[self.perm_table]
+        if variants.shape[1] == 0:
+            return variants[:1]
+        rows = variants.view(np.dtype((np.void, variants.shape[1]))).ravel()
+        _, first_idxs = np.unique(rows, return_index=True)
+        first_idxs.sort()
+        return variants[first_idxs]
+
+    def orbit_size(self, cube: list) -> int:
+        """Returns the size of the orbit of the cube without collecting its
+        members: the order of the group divided by the size of the
+        stabilizer of the cube (the rows of perm_table that fix it).
+        """
+        if self.generators_only:
+            return len(self.get_orbit_closure(cube))
+        cube_arr = np.frombuffer(''.join(cube).encode(), dtype=np.uint8)
+        stabilizer = int(np.count_nonzero((cube_arr[self.perm_table] == cube_arr).all(axis=1)))
+        return len(self.perm_table) // stabilizer
+
+    def get_orbit_closure(self, cube: list):
+        # Breadth-first closure of the cube under the generators,
+        # the first element of the orbit is the cube itself.
+        eq_set = set([str(cube)])
+        cube_eq_class = [cube[::]]
 
-        for perm in self.perm_table:
-            new_cube = cube[::]
-            for idx,val in enumerate(perm):
-                new_cube[idx] = cube[val]
-            if not str(new_cube) in eq_set:
-                cube_eq_class.append(new_cube)
-                eq_set.add(str(new_cube))
+        idx = 0
+        while idx < len(cube_eq_class):
+            current = cube_eq_class[idx]
+            idx += 1
+            for perm in self.generators:
+                new_cube = [current[val] for val in perm]
+                if not str(new_cube) in eq_set:
+                    cube_eq_class.append(new_cube)
+                    eq_set.add(str(new_cube))
 
         return cube_eq_class
 
+    def get_transpositions(self) -> List[Dict[Tuple[int,int],List[int]]]:
+        # Atom permutations of every transposition of every sort,
+        # computed once on the first canonicalization.
+        if self.transpositions is None:
+            self.transpositions = []
+            identity = [tuple(range(len(domain))) for domain in self.domains.values()]
+            for s_idx,domain in enumerate(self.domains.values()):
+                sort_transpositions = {}
+                for (e1,e2) in combinations(range(len(domain)),2):
+                    elem_perm = list(range(len(domain)))
+                    elem_perm[e1], elem_perm[e2] = e2, e1
+                    perm = identity[::]
+                    perm[s_idx] = tuple(elem_perm)
+                    sort_transpositions[(e1,e2)] = self.permute_atoms(perm)
+                self.transpositions.append(sort_transpositions)
+        return self.transpositions
+
+    def get_twin_classes(self, cube: list) -> List[List[int]]:
+        """Partitions the elements of each sort into classes of twins, i.e.
+        elements whose exchange leaves the cube unchanged. Returns for
+        every sort and element the smallest element of its class.
+        """
+        twin_classes = []
+        for s_idx,sort_transpositions in enumerate(self.get_transpositions()):
+            class_of = list(range(len(self.domains[self.sort_names[s_idx]])))
+            class_reps: List[int] = []
+            for elem in range(len(class_of)):
+                for rep in class_reps:
+                    perm = sort_transpositions[(rep,elem)]
+                    if all(cube[val] == cube[idx] for idx,val in enumerate(perm)):
+                        class_of[elem] = rep
+                        break
+                else:
+                    class_reps.append(elem)
+            twin_classes.append(class_of)
+        return twin_classes
+
+    def canonicalize(self, cube: list) -> list:
+        """Returns the lexicographically smallest ('-' < '0' < '1') member
+        of the orbit of the cube.
+
+        The domain permutation is built atom by atom, only keeping the
+        partial permutations that give the smallest prefix so far. The
+        branching is restricted to one element per class of twins (elements
+        interchangeable in the cube), which refines the candidates of each
+        sort instead of trying every permutation.
+        """
+        if not self.symmetric:
+            return cube[::]
+        twin_classes = self.get_twin_classes(cube)
+        sizes = [len(self.domains[sort]) for sort in self.sort_names]
+        frontier = [tuple([(-1,)*size for size in sizes])]
+        canonical = []
+        for (pred,arg_ids) in self.atom_args:
+            # elements that must be mapped before the atom can be placed
+            needed = []
+            for (s_idx,e_id) in arg_ids:
+                if s_idx == -1:
+                    needed.extend([(self.super_set_id,ss_id) for ss_id in range(sizes[self.super_set_id])])
+                elif not (s_idx,e_id) in needed:
+                    needed.append((s_idx,e_id))
+            best = None
+            next_frontier = []
+            for node in frontier:
+                for ext in self.extend_partial_perm(node,needed,twin_classes):
+                    permuted = []
+                    for (s_idx,e_id) in arg_ids:
+                        if s_idx == -1:
+                            ss_map = ext[self.super_set_id]
+                            permuted.append(self.quorum_image(ss_map, e_id))
+                        else:
+                            permuted.append(ext[s_idx][e_id])
+                    lit = cube[self.atom_ids[(pred,tuple(permuted))]]
+                    if best is None or lit < best:
+                        best = lit
+                        next_frontier = [ext]
+                    elif lit == best:
+                        next_frontier.append(ext)
+            frontier = next_frontier
+            canonical.append(best)
+        return canonical
+
+    def extend_partial_perm(self, node, needed, twin_classes):
+        partial_perms = [node]
+        for (s_idx,e_id) in needed:
+            if partial_perms[0][s_idx][e_id] != -1:
+                continue
+            extended = []
+            for partial in partial_perms:
+                elem_map = partial[s_idx]
+                used = set(elem_map)
+                tried = set()
+                for target in range(len(elem_map)):
+                    twin = twin_classes[s_idx][target]
+                    if target in used or twin in tried:
+                        continue
+                    # unused twins of target lead to the same branch
+                    tried.add(twin)
+                    new_map = list(elem_map)
+                    new_map[e_id] = target
+                    extended.append(partial[:s_idx] + (tuple(new_map),) + partial[s_idx+1:])
+            partial_perms = extended
+        return partial_perms
+
+    def quorum_image(self, ss_map, q_idx: int) -> int:
+        return self.quorum_of_members[tuple(sorted([ss_map[ss_id] for ss_id in self.quorum_members[q_idx]]))]
+
     """ A function to check if a given set of cubes is closed
         under domain symmetry.
     """
     def is_cube_set_symmetric(self, cube_strs) -> bool:
-        
-        cube_set = set()
-        for cube_str in cube_strs:
-            expands = [(c,) if c != '-' else ('0', '1') for c in cube_str]
-            #print(cube_str,'->',expands,list(product(*expands)))
-            
-            for full_cube in product(*expands):
-                cube_set.add(tuple(''.join(full_cube)))
-
-        for cube_str in cube_strs:
-            cube = list(cube_str)
-            if '-' in cube:
-                expands = [(c,) if c != '-' else ('0', '1') for c in cube_str]
-                for full_cube in product(*expands):
-                    eq_class = self.get_symmetric_variants(list(full_cube))
-                    for other in eq_class:
-                        if not tuple(other) in cube_set:
-                            exit("Error, symmetric variant {} of {} is missing from the cube set.".format(''.join(other),cube_str))
-            else:
-                eq_class = self.get_symmetric_variants(cube)
-                for other in eq_class:
-                    if not tuple(other) in cube_set:
-                        exit("Error, symmetric variant {} of {} is missing from the cube set.".format(''.join(other),cube_str))
-        return True
\ No newline at end of file
+        # The set of cubes is closed under the group iff it is closed under
+        # each generator. Every permuted cube is checked to be covered by the
+        # union of the input cubes: directly if it is an input cube, otherwise
+        # by a SAT call (cube & ~(union of the cubes) has to be UNSAT).
+        cube_set = set(cube_strs)
+        checked = set()
+        with Cadical() as sat_solver:
+            for cube_str in cube_strs:
+                sat_solver.add_clause(self.get_negated_clause(cube_str))
+            for cube_str in cube_strs:
+                for perm in self.generators:
+                    other = ''.join([cube_str[val] for val in perm])
+                    if other in cube_set or other in checked:
+                        continue
+                    checked.add(other)
+                    if sat_solver.solve(assumptions=self.get_negated_clause(other,negate=False)):
+                        model = sat_solver.get_model()
+                        values = set(model)
+                        missing = ''.join(['1' if idx+1 in values else '0' if -(idx+1) in values else '-' for idx in range(len(cube_str))])
+                        exit("Error, symmetric variant {} (minterm {}) of {} is missing from the cube set.".format(other,missing,cube_str))
+        return True
+
+    def get_negated_clause(self, cube_str: str, negate: bool = True) -> List[int]:
+        # literals of the cube over the variables 1..n (negated by default)
+        sign = -1 if negate else 1
+        lits = []
+        for idx,lit in enumerate(cube_str):
+            if lit == '1':
+                lits.append(sign*(idx+1))
+            elif lit == '0':
+                lits.append(-1*sign*(idx+1))
+        return lits
+
+
+class PermTableCache():
+    """A directory of permutation tables shared between runs.
+
+    The tables are stored as .npy files (loaded memory-mapped), keyed by
+    a hash of the signature of the relations, the order of the atoms and
+    the size of each sort. When the total size of the directory exceeds
+    the limit, the least recently used tables are deleted.
+    """
+    def __init__(self, cache_dir: str, max_size_mb: int = 1024) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1024 * 1024
+        self.v = 0
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, predicates, atoms, sizes: Dict[str,int]) -> str:
+        signature = json.dumps([sorted(predicates.items()), [[pred,list(args)] for (pred,args) in atoms], sorted(sizes.items())])
+        return hashlib.sha256(signature.encode()).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, '{}.npy'.format(key))
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        path = self.get_path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            table = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        # the modification time is the last use of the table
+        os.utime(path)
+        if self.v > 0: print('Permutation table is loaded from {}'.format(path))
+        return table
+
+    def store(self, key: str, table: np.ndarray) -> None:
+        path = self.get_path(key)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as table_file:
+            np.save(table_file, table)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npy'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum([size for (_,size,_) in entries])
+        for (_,size,path) in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
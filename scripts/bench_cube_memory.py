@@ -0,0 +1,76 @@
+import sys
+import os
+import time
+import tracemalloc
+
+# Memory benchmark of the Cube representation: the list based cube (one
+# string per atom plus the care/care_neg literal lists, reproduced below)
+# against the bit-packed Cube of prime_implicants.py. The cubes are read
+# back from a covering CNF printed with --print-dimacs (every clause is
+# [-selector] + negated PI literals), e.g. the pyv-firewall-n4 instance
+# of the CaDiCaL based minimizer.
+# Usage: python3 bench_cube_memory.py [covering.cnf] [copies]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'py-qsm'))
+from prime_implicants import Cube
+
+cnf_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cadical_based_minimizer', 'test', 'pyv-firewall-n4.cnf')
+copies = 10
+
+if len(sys.argv) > 1:
+    cnf_path = sys.argv[1]
+    if len(sys.argv) > 2:
+        copies = int(sys.argv[2])
+
+class ListCube():
+    def __init__(self, lit_strs):
+        self.id = 0
+        self.all_literals = lit_strs[:]
+        self.care = []
+        self.care_neg = []
+        for idx,lit in enumerate(lit_strs):
+            v = idx+1
+            if lit == '1':
+                self.care.append(v)
+                self.care_neg.append(-1*v)
+            elif lit == '0':
+                self.care.append(-1*v)
+                self.care_neg.append(v)
+        self.len = len(self.care)
+
+def read_cubes(path):
+    clauses = []
+    with open(path,'r') as cnf_file:
+        for line in cnf_file:
+            if line.startswith('p') or line.startswith('c') or not line.strip():
+                continue
+            clauses.append([int(lit) for lit in line.split()[:-1]])
+    # selectors are the ids of the PIs, they come after the atoms
+    nof_atoms = min([-1*clause[0] for clause in clauses]) - 1
+    cubes = []
+    for clause in clauses:
+        cube = ['-']*nof_atoms
+        for lit in clause[1:]:
+            cube[abs(lit)-1] = '0' if lit > 0 else '1'
+        cubes.append(cube)
+    return nof_atoms, cubes
+
+def measure(cube_class, cubes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = [cube_class(cube) for cube in cubes]
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current, peak, elapsed
+
+nof_atoms, cubes = read_cubes(cnf_path)
+Cube.setup_universe(nof_atoms+1, ['a{}'.format(idx) for idx in range(nof_atoms)])
+cubes = cubes * copies
+
+print("Instance: {} ({} atoms, {} cubes)".format(cnf_path.split('/')[-1], nof_atoms, len(cubes)))
+print("{:12s} {:>12s} {:>12s} {:>12s} {:>10s}".format("Cube","memory","peak","bytes/cube","time"))
+for name,cube_class in [("list-based",ListCube),("bit-packed",Cube)]:
+    current, peak, elapsed = measure(cube_class, cubes)
+    print("{:12s} {:>10.1f}MB {:>10.1f}MB {:>12.1f} {:>9.3f}s".format(name, current/2**20, peak/2**20, current/len(cubes), elapsed))
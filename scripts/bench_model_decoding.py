@@ -0,0 +1,81 @@
+import sys
+import os
+import time
+import random
+import numpy as np
+
+# Micro-benchmark of the per-model work of the PI enumeration loop, without
+# the SAT solver: decoding a dual-rail model into a cube and building the
+# blocking clauses of an orbit. The original code (list scans of the model
+# and one list per member, reproduced below) against DualEncoder.decode_model
+# and DualEncoder.get_orbit_blocking_clauses on random models and orbits.
+# Usage: python3 bench_model_decoding.py [atoms] [models] [orbit size]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'py-qsm'))
+from sat_encodings import DualEncoder
+
+nof_atoms = 100
+nof_models = 2000
+orbit_size = 24
+
+if len(sys.argv) > 1:
+    nof_atoms = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        nof_models = int(sys.argv[2])
+        if len(sys.argv) > 3:
+            orbit_size = int(sys.argv[3])
+
+def list_scan_decode(de, sol):
+    cube = ['-']*nof_atoms
+    for idx,atom in enumerate(de.atoms):
+        if de.atom2vars[idx][1] in sol:
+            cube[idx] = '1'
+        elif de.atom2vars[idx][0] in sol:
+            cube[idx] = '0'
+    return cube
+
+def list_blocking_clauses(de, cube_class):
+    clauses = []
+    for c in cube_class:
+        blocking_clause = []
+        for idx,_ in enumerate(de.atoms):
+            if c[idx] == '1':
+                blocking_clause.append(-1*de.atom2vars[idx][1])
+            elif c[idx] == '0':
+                blocking_clause.append(-1*de.atom2vars[idx][0])
+        clauses.append(blocking_clause)
+    return clauses
+
+random.seed(0)
+de = DualEncoder(['a{}'.format(idx) for idx in range(nof_atoms)])
+de.build_dualrail_clauses([])
+models = []
+for _ in range(nof_models):
+    values = [random.choice('-01') for _ in range(nof_atoms)]
+    sol = []
+    for idx,lit in enumerate(values):
+        sol += [2*idx+1 if lit == '1' else -(2*idx+1), 2*idx+2 if lit == '0' else -(2*idx+2)]
+    models.append(sol)
+orbits = [[list(''.join([random.choice('-01') for _ in range(nof_atoms)])) for _ in range(orbit_size)] for _ in range(100)]
+orbit_arrays = [np.frombuffer(''.join([''.join(c) for c in orbit]).encode(), dtype=np.uint8).reshape(orbit_size,nof_atoms) for orbit in orbits]
+
+start = time.perf_counter()
+scan_cubes = [''.join(list_scan_decode(de, sol)) for sol in models]
+scan_decode = time.perf_counter() - start
+start = time.perf_counter()
+cubes = [de.decode_model(sol) for sol in models]
+view_decode = time.perf_counter() - start
+assert (scan_cubes == cubes)
+
+start = time.perf_counter()
+list_clauses = [list_blocking_clauses(de, orbit) for orbit in orbits]
+list_blocking = time.perf_counter() - start
+start = time.perf_counter()
+array_clauses = [de.get_orbit_blocking_clauses(orbit) for orbit in orbit_arrays]
+array_blocking = time.perf_counter() - start
+assert (list_clauses == array_clauses)
+
+print("{} atoms, {} models, {} orbits of size {}".format(nof_atoms, nof_models, len(orbits), orbit_size))
+print("{:20s} {:>12s} {:>12s} {:>8s}".format("","original","vectorized","speedup"))
+print("{:20s} {:>10.2f}us {:>10.2f}us {:>7.1f}x".format("decode / model", 1e6*scan_decode/nof_models, 1e6*view_decode/nof_models, scan_decode/view_decode))
+print("{:20s} {:>10.2f}us {:>10.2f}us {:>7.1f}x".format("blocking / orbit", 1e6*list_blocking/len(orbits), 1e6*array_blocking/len(orbits), list_blocking/array_blocking))
@@ -0,0 +1,116 @@
+import sys
+import os
+import copy
+import time
+import yaml
+import itertools
+from math import comb
+
+# Micro-benchmark of the construction of the permutation table of the
+# minimizer: the original list-scan construction (reproduced below) against
+# the hashed/vectorized construction of DomainSymmetryHandler, on the
+# quorum-bearing instances of instances.yaml.
+# Usage: python3 bench_perm_table.py instances.yaml path-to-ivybench [repeat]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'py-qsm'))
+from input_parser import protocol_parser, DeclarationCollector
+from symmetry import DomainSymmetryHandler
+
+instance_path = None
+path_prefix = None
+repeat = 3
+
+if len(sys.argv) > 1:
+    assert (len(sys.argv) > 2)
+    instance_path = sys.argv[1]
+    path_prefix = sys.argv[2]
+    if len(sys.argv) > 3:
+        repeat = int(sys.argv[3])
+
+def list_scan_perm_table(dsh, predicates, atoms):
+    # The construction before the hashed indexes: every lookup is a list scan.
+    sort_names = list(dsh.domains.keys())
+    all_perms = [itertools.permutations(list(range(len(domain)))) for domain in dsh.domains.values()]
+    super_set_id = sort_names.index(dsh.superset_sort) if dsh.has_quorum else -1
+    perm_table = []
+    for perm in itertools.product(*all_perms):
+        if dsh.has_quorum:
+            permuted_quorum = []
+            for majority,q_idx in dsh.quorum_map.items():
+                permuted_majority = []
+                for m in majority:
+                    ss_pos = dsh.super_set_elements.index(m)
+                    permuted_majority.append(dsh.super_set_elements[perm[super_set_id][ss_pos]])
+                permuted_quorum.append(dsh.quorum_map[tuple(sorted(permuted_majority))])
+        permuted_atom_positions = []
+        for (pred,args) in atoms:
+            permuted_args = []
+            for (arg,arg_sort) in zip(args,predicates[pred]):
+                if arg_sort == dsh.quorum_sort:
+                    permuted_args.append(dsh.quorum_names[permuted_quorum[dsh.quorum_names.index(arg)]])
+                else:
+                    sort_id = sort_names.index(arg_sort)
+                    original_id = dsh.domains[arg_sort].index(arg)
+                    permuted_args.append(dsh.domains[arg_sort][perm[sort_id][original_id]])
+            permuted_atom_positions.append(atoms.index((pred,permuted_args)))
+        perm_table.append(permuted_atom_positions)
+    return perm_table
+
+def ground_atoms(predicates, domains):
+    atoms = []
+    for pred,arg_sorts in predicates.items():
+        if not all([sort in domains for sort in arg_sorts]):
+            continue
+        for args in itertools.product(*[sorted(domains[sort]) for sort in arg_sorts]):
+            atoms.append((pred,list(args)))
+    return atoms
+
+def best_time(fun):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fun()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best, result
+
+print("{:40s} {:>8s} {:>8s} {:>12s} {:>12s} {:>8s}".format("Name","#atoms","|G|","list-scan","hashed","speedup"))
+with open(instance_path,'r') as yaml_file:
+    instances = yaml.safe_load(yaml_file)
+    for instance,data in instances.items():
+        sizes = data["size"]
+        quorum_ss = None
+        quorum_sort = None
+        for sort_name,interval in sizes.items():
+            if "superset" in interval.keys():
+                quorum_ss = interval["superset"]
+                quorum_sort = sort_name
+        if quorum_ss is None:
+            continue
+
+        ivy_path = "{}{}".format(path_prefix,data["path"])
+        if not os.path.isfile(ivy_path):
+            print('Did not find ivy file of {}.'.format(instance))
+            continue
+        dc = DeclarationCollector()
+        dc.verbosity = 0
+        with open(ivy_path, 'r', newline='') as protocol_file:
+            dc.visit(protocol_parser.parse(protocol_file.read()))
+        predicates = dc.pp.predicates
+
+        for ss_size in range(sizes[quorum_ss]["from"],sizes[quorum_ss]["to"]+1):
+            domains = {}
+            for sort_name,interval in sizes.items():
+                if sort_name == quorum_sort:
+                    continue
+                size = ss_size if sort_name == quorum_ss else interval["from"]
+                domains[sort_name] = set(["{}{}".format(sort_name[0],idx) for idx in range(size)])
+            domains[quorum_sort] = set(["q{}".format(idx) for idx in range(comb(ss_size,int(ss_size/2)+1))])
+            atoms = ground_atoms(predicates, domains)
+            name = "{}-{}".format(instance,'-'.join([k[0]+str(len(v)) for (k,v) in domains.items()]))
+
+            hashed_time, dsh = best_time(lambda: DomainSymmetryHandler(copy.deepcopy(domains),predicates,atoms))
+            scan_time, perm_table = best_time(lambda: list_scan_perm_table(dsh,predicates,atoms))
+            assert (perm_table == dsh.perm_table.tolist())
+            print("{:40s} {:>8d} {:>8d} {:>11.4f}s {:>11.4f}s {:>7.1f}x".format(name,len(atoms),len(perm_table),\
+                scan_time,hashed_time,scan_time/hashed_time), flush=True)
@@ -0,0 +1,43 @@
+import sys
+import os
+import time
+
+# Timing comparison of the PI enumeration engines of the DualEncoder: the
+# cardinality sweep over an ITotalizer ('totalizer') against the shrinking
+# of the models to PIs ('minimal'). Both runs have to find the same orbits.
+# Usage: python3 bench_pi_engines.py protocol.ivy reachable.pla [protocol.ivy reachable.pla ...]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'py-qsm'))
+from input_parser import parse_input_files
+from symmetry import DomainSymmetryHandler
+from sat_encodings import DualEncoder
+from prime_implicants import Cube, PIClass
+
+if len(sys.argv) < 3 or len(sys.argv) % 2 == 0:
+    print("Usage: python3 bench_pi_engines.py protocol.ivy reachable.pla [protocol.ivy reachable.pla ...]")
+    sys.exit(1)
+
+def run_engine(engine, atoms, dsh, cube_strs):
+    de = DualEncoder(atoms)
+    de.verbosity = 0
+    de.lazy_orbits = True
+    de.pi_engine = engine
+    start = time.perf_counter()
+    pi_classes = de.extract_prime_implicants(dsh, cube_strs)
+    elapsed = time.perf_counter() - start
+    orbits = set([''.join(dsh.canonicalize(pic.repr_pi.all_literals)) for pic in pi_classes])
+    return elapsed, orbits, sum([pic.size for pic in pi_classes])
+
+print("{:30s} {:>8s} {:>8s} {:>10s} {:>12s} {:>12s} {:>8s}".format("Name","#atoms","#cubes","#orbits","totalizer","minimal","speedup"))
+for (ivy_path,pla_path) in zip(sys.argv[1::2],sys.argv[2::2]):
+    pp, cube_strs = parse_input_files(ivy_path,pla_path,True)
+    atoms = pp.atom_strs
+    Cube.setup_universe(len(atoms)+1,atoms)
+    PIClass.setup_universe(pp.atoms)
+    dsh = DomainSymmetryHandler(pp.sort_elements,pp.predicates,pp.atoms)
+
+    totalizer_time, totalizer_orbits, totalizer_pis = run_engine('totalizer', atoms, dsh, cube_strs)
+    minimal_time, minimal_orbits, minimal_pis = run_engine('minimal', atoms, dsh, cube_strs)
+    assert (totalizer_orbits == minimal_orbits and totalizer_pis == minimal_pis)
+    print("{:30s} {:>8d} {:>8d} {:>10d} {:>11.3f}s {:>11.3f}s {:>7.1f}x".format(pla_path.split('/')[-1],len(atoms),len(cube_strs),\
+        len(minimal_orbits),totalizer_time,minimal_time,totalizer_time/minimal_time), flush=True)
@@ -81,7 +81,7 @@ with open(instance_path,'r') as yaml_file:
             pis_path = "{}/{}/{}.pis".format(output_dir,name,name)
             err_path = "{}/{}/gen-pis-{}.err".format(output_dir,name,name)
             
-            spl = shlex.split("{} --time-limit={} --real-time-limit={} --space-limit={} python3.10 {}/minimizer.py {} {} --only-pis".format(runlim_path,T,R,S,minimizer_path,ivy_path,pla_path))
+            spl = shlex.split("{} --time-limit={} --real-time-limit={} --space-limit={} python3.10 {}/minimizer.py {} {} --only-pis --perm-cache={}/perm-cache --checkpoint={}/{}/{}.ckpt --resume --save-pis={}/{}/{}.pis.npz".format(runlim_path,T,R,S,minimizer_path,ivy_path,pla_path,outdir,output_dir,name,name,output_dir,name,name))
             # print("{} Running {} -> {}".format(inst_counter,name,pis_path))
             # print(' '.join(spl))
          
@@ -92,7 +92,13 @@ with open(instance_path,'r') as yaml_file:
             dimacs_path = "{}/{}/{}.cnf".format(output_dir,name,name)
             orbit_info = "{}/{}/{}_qcosts.txt".format(output_dir,name,name)
 
-            spl = shlex.split("{} --time-limit={} --real-time-limit={} --space-limit={} python3.10 {}/minimizer.py {} {} --pi-weights={} --print-dimacs={} --print-classinfo={} --all-solutions".format(runlim_path,T,R,S,minimizer_path,ivy_path,pla_path,qpi_path,dimacs_path,orbit_info))
+            # The store is only a candidate: the minimizer checks it against the
+            # reachable states of the PLA and re-enumerates (and re-saves) the
+            # PIs when it is stale.
+            pis_store = "{}/{}/{}.pis.npz".format(output_dir,name,name)
+            load_pis = "--load-pis={}".format(pis_store) if os.path.isfile(pis_store) else ""
+
+            spl = shlex.split("{} --time-limit={} --real-time-limit={} --space-limit={} python3.10 {}/minimizer.py {} {} --pi-weights={} --print-dimacs={} --print-classinfo={} --all-solutions --perm-cache={}/perm-cache {}".format(runlim_path,T,R,S,minimizer_path,ivy_path,pla_path,qpi_path,dimacs_path,orbit_info,outdir,load_pis))
             # print("{} Running {}".format(inst_counter,name))
             # print("{} 1> {} 2> {}".format(' '.join(spl),log_path, err_path))
             